@@ -0,0 +1,191 @@
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+import streamlit as st
+
+import recipe_db
+
+# --- 1. SETTINGS ---
+# How many names a dish picker offers at once
+AUTOCOMPLETE_LIMIT = int(os.environ.get("CHEF_AI_AUTOCOMPLETE_LIMIT", 20))
+# Share of the query's trigrams a title must contain to count as a (misspelt) match
+MIN_CONTAINMENT = 0.5
+# Prefix matches looked at per query; enough to fill a page of suggestions, however short the prefix
+PREFIX_SCAN = 256
+NGRAM = 3
+# Most trigram postings read per query; past this the commonest trigrams are left out
+POSTINGS_BUDGET = 20000
+NON_WORD = re.compile(r"[^\w\u0E00-\u0E7F]+|_")
+
+
+def normalise_title(text):
+    """
+    Case-folded words with single spaces; punctuation becomes a space.
+    The whole Thai block is kept, since Thai vowel and tone marks are part of the word.
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return " ".join(NON_WORD.sub(" ", text).split())
+
+
+def trigram_codes(texts, complete=True):
+    """
+    Distinct (text number, trigram) pairs of normalised titles as two NumPy arrays, each
+    trigram packed into one int64 (21 bits per character). Only whole titles are padded
+    at the end: a query is usually still being typed.
+    """
+    padded = [f" {text} " if complete else f" {text}" for text in texts]
+    lengths = np.array([len(text) for text in padded], dtype=np.int64)
+    chars = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    if len(chars) < NGRAM:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    codes = (chars[:-2] << 42) | (chars[1:-1] << 21) | chars[2:]
+    owners = np.repeat(np.arange(len(padded)), lengths)[:-2]
+    # Trigrams running across the end of one title into the next are dropped
+    inside = np.arange(len(codes)) + NGRAM <= np.cumsum(lengths)[owners]
+    grams, gram_ids = np.unique(codes[inside], return_inverse=True)
+    pairs = np.sort(owners[inside] * len(grams) + gram_ids)
+    pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])]
+    return pairs // len(grams), grams[pairs % len(grams)]
+
+
+# --- 2. INDEX ---
+class TitleIndex:
+    """
+    English and Thai dish names, indexed two ways: every word start in one sorted list for
+    prefix completion, and trigram postings (flat NumPy arrays, as in recipe_search) for
+    names typed with mistakes. Each name is one key; a dish has one or two keys.
+    """
+    def __init__(self, names, thai_names):
+        self.names = list(names)
+        self.thai_names = {name: thai for name, thai in zip(self.names, thai_names) if thai}
+        keys = []
+        key_dish = []
+        for dish, (name, thai) in enumerate(zip(self.names, thai_names)):
+            for title in (name, thai):
+                text = normalise_title(title)
+                if text:
+                    keys.append(text)
+                    key_dish.append(dish)
+        self.keys = keys
+        self.key_dish = np.array(key_dish, dtype=np.int32)
+
+        # Prefix search: the text from every word start on, sorted, with its dish and
+        # whether it is the start of the whole name
+        starts = []
+        for k, text in enumerate(keys):
+            words = text.split(" ")
+            starts.extend((" ".join(words[w:]), key_dish[k], w == 0) for w in range(len(words)))
+        starts.sort(key=lambda start: start[0])
+        self._suffixes = [suffix for suffix, _, _ in starts]
+        self._suffix_dish = [dish for _, dish, _ in starts]
+        self._suffix_whole = [whole for _, _, whole in starts]
+
+        # Typo search: sorted trigram codes, and the keys containing each one
+        owners, codes = trigram_codes(keys)
+        self.grams, gram_ids = np.unique(codes, return_inverse=True)
+        self.key_ids = owners[np.argsort(gram_ids, kind="stable")].astype(np.int32)
+        counts = np.bincount(gram_ids, minlength=len(self.grams))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.key_grams = np.bincount(owners, minlength=len(keys))
+
+    def __len__(self):
+        return len(self.names)
+
+    def thai(self, name):
+        return self.thai_names.get(name, "")
+
+    def _prefix_matches(self, query):
+        """
+        {dish: score} for names with a word starting with the query; a match at the start
+        of the name ranks above one further in.
+        """
+        found = {}
+        first = bisect_left(self._suffixes, query)
+        for j in range(first, min(first + PREFIX_SCAN, len(self._suffixes))):
+            if not self._suffixes[j].startswith(query):
+                break
+            dish = self._suffix_dish[j]
+            found[dish] = max(found.get(dish, 0.0), 3.0 if self._suffix_whole[j] else 2.0)
+        return found
+
+    def _trigram_matches(self, query, limit):
+        """
+        {dish: score} for the names containing most of the query's trigrams, scored by the share
+        contained plus a little for overall similarity, so the closer spelling wins ties.
+        The postings of very common trigrams are skipped once POSTINGS_BUDGET is reached,
+        and the share is estimated from the rest.
+        """
+        _, codes = trigram_codes([query], complete=False)
+        query_grams = len(codes)
+        positions = np.minimum(np.searchsorted(self.grams, codes), max(len(self.grams) - 1, 0))
+        gram_ids = positions[self.grams[positions] == codes] if len(self.grams) else positions[:0]
+        if len(gram_ids) < query_grams * MIN_CONTAINMENT:
+            return {}
+        sizes = self.offsets[gram_ids + 1] - self.offsets[gram_ids]
+        order = np.argsort(sizes, kind="stable")
+        used = order[:max(1, int(np.searchsorted(np.cumsum(sizes[order]), POSTINGS_BUDGET, side="right")))]
+        ids = np.concatenate([self.key_ids[self.offsets[g]:self.offsets[g + 1]] for g in gram_ids[used]])
+        if len(ids) * 8 < len(self.keys):
+            keys, matched = np.unique(ids, return_counts=True)
+        else:
+            matched = np.bincount(ids, minlength=len(self.keys))
+            keys = np.flatnonzero(matched)
+            matched = matched[keys]
+        # Share of the query's trigrams each key contains, scaled up from the postings read
+        containment = matched / len(used) * len(gram_ids) / query_grams
+        good = containment >= MIN_CONTAINMENT
+        keys, containment = keys[good], containment[good]
+        dice = 2 * containment * query_grams / (query_grams + self.key_grams[keys])
+        scores = containment + 0.1 * dice
+        if len(keys) > 2 * limit:
+            top = np.argpartition(-scores, 2 * limit - 1)[:2 * limit]
+            keys, scores = keys[top], scores[top]
+        found = {}
+        for dish, score in zip(self.key_dish[keys].tolist(), scores.tolist()):
+            found[dish] = max(found.get(dish, 0.0), score)
+        return found
+
+    def complete(self, query, limit=AUTOCOMPLETE_LIMIT):
+        """
+        Up to `limit` dish names for what has been typed so far, in English or Thai, best first.
+        Names starting with the query come first, then names with a word starting with it,
+        then names that are close in spelling. An empty query gives the first dishes in sheet order.
+        """
+        query = normalise_title(query)
+        if not query:
+            return self.names[:limit]
+        found = self._prefix_matches(query)
+        if len(found) < limit and len(query) >= NGRAM - 1:
+            for dish, score in self._trigram_matches(query, limit).items():
+                found[dish] = max(found.get(dish, 0.0), score)
+        best = sorted(found.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [self.names[dish] for dish, _ in best]
+
+
+@st.cache_resource(max_entries=2)
+def build_title_index(version):
+    """
+    Builds the index once per dataset version.
+    """
+    rows = recipe_db.get_title_pairs()
+    return TitleIndex([row[0] for row in rows], [row[1] or "" for row in rows])
+
+
+# --- 3. PICKER ---
+def dish_picker(version, label, key, placeholder="Choose a recipe..."):
+    """
+    Name box plus selectbox: the selectbox only ever holds the few best completions of
+    what was typed, so the browser never receives the whole catalogue.
+    """
+    index = build_title_index(version)
+    query = st.text_input(f"{label} (type an English or Thai name)", key=f"{key}_query",
+                          placeholder="e.g. pad thai, ผัดไทย")
+    options = index.complete(query)
+    if not query.strip() and len(index) > len(options):
+        st.caption(f"Showing the first {len(options)} of {len(index)} dishes. Type a name to find the others.")
+    elif query.strip() and not options:
+        st.caption("No dish names match.")
+    return st.selectbox(label, options=options, index=None, placeholder=placeholder, key=key)
@@ -0,0 +1,285 @@
+"""
+Headless rerun benchmark for the Streamlit pages.
+
+Runs scripted sessions through Streamlit's AppTest against the fixture sheet, the stub
+LLM backend and a fixture transcript, then reports p50/p95 rerun time and memory per
+scenario and saves the run as JSON.
+
+    python benchmark.py --sessions 5 --messages 3
+    python benchmark.py --compare .cache/benchmarks/bench-20260101-120000.json
+    python benchmark.py --warmup      # first loads after the server-start warm-up (warmup.py)
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --- 1. STAND-INS ---
+# Set before any app module is imported, since they read their settings at import time.
+os.environ.setdefault("CHEF_AI_SHEET_FIXTURE", os.path.join(APP_DIR, "fixtures", "datafoods.csv"))
+os.environ.setdefault("CHEF_AI_TRANSCRIPT_FIXTURE", os.path.join(APP_DIR, "fixtures", "transcript.json"))
+os.environ.setdefault("CHEF_AI_LLM_BACKEND", "stub")
+os.environ.setdefault("CHEF_AI_REFRESH_INTERVAL", "3600")
+
+MAIN_SCRIPT = os.path.join(APP_DIR, "main.py")
+RESULTS_DIR = os.path.join(APP_DIR, ".cache", "benchmarks")
+VIDEO_URL = "https://www.youtube.com/watch?v=bench0000001"
+QUESTIONS = [
+    "What can I use instead of fish sauce?",
+    "How hot should the wok be?",
+    "Can I make it less spicy?",
+    "What can I use instead of palm sugar?",
+    "How long does it keep in the fridge?",
+]
+
+
+def find(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+# --- 2. SESSIONS ---
+class Session:
+    """
+    One browser session: an AppTest whose every rerun is timed and measured.
+    """
+    def __init__(self, page, trace_memory, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(MAIN_SCRIPT, default_timeout=timeout)
+        if page != "main.py":
+            self.at.switch_page(page)
+        self.trace_memory = trace_memory
+        self.samples = []
+
+    def run(self, step, action=None):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        (action or self.at.run)()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+        if self.at.exception:
+            raise RuntimeError(f"{step}: {self.at.exception[0].value}")
+        self.samples.append({"step": step, "ms": elapsed * 1000, "peak_kb": peak / 1024 if peak is not None else None})
+
+    def send_messages(self, count):
+        for question in (QUESTIONS * count)[:count]:
+            self.run("send message", lambda q=question: self.at.chat_input[0].set_value(q).run())
+
+
+def scenario_main(session, args):
+    at = session.at
+    session.run("first load")
+    titles = at.sidebar.selectbox[0].options
+    for title in titles[:args.dishes]:
+        session.run("select dish", lambda t=title: at.sidebar.selectbox[0].select(t).run())
+    name_box = "Find a dish by name (English or Thai)"
+    session.run("type dish name", lambda: find(at.sidebar.text_input, name_box).set_value("pad thia").run())
+    session.run("clear dish name", lambda: find(at.sidebar.text_input, name_box).set_value("").run())
+    search_box = "Search ingredients or method"
+    session.run("search", lambda: find(at.sidebar.text_input, search_box).set_value("garlic chilli").run())
+    session.run("clear search", lambda: find(at.sidebar.text_input, search_box).set_value("").run())
+    session.run("toggle chat", lambda: at.toggle(key="chat_toggle_key").set_value(True).run())
+    session.send_messages(args.messages)
+
+
+def scenario_for_you(session, args):
+    at = session.at
+    session.run("first load")
+    for category in ["Pork", "Chicken", "Prawn"][:args.dishes]:
+        selection = {"selection": {"points": [{"x": category}], "point_indices": [0], "box": [], "lasso": []}}
+
+        def click_bar(selection=selection):
+            at.session_state["category_chart"] = selection
+            at.run()
+        session.run("click chart bar", click_bar)
+    session.run("sort table", lambda: find(at.selectbox, "Sort by").select("Name (A-Z)").run())
+    session.run("find similar", lambda: find(at.selectbox, "Find dishes like:").select_index(1).run())
+    session.run("toggle chat", lambda: find(at.sidebar.toggle, "Enable AI Chat Assistant").set_value(True).run())
+    picker = find(at.selectbox, "Select a dish to discuss:")
+    session.run("select dish", lambda: picker.select(picker.options[0]).run())
+    session.send_messages(args.messages)
+
+
+def scenario_youtube(session, args):
+    at = session.at
+    session.run("first load")
+    at.text_input[0].set_value(VIDEO_URL)
+    session.run("extract", lambda: find(at.button, "Extract Recipe 👨‍🍳").click().run())
+    deadline = time.monotonic() + args.timeout
+    while at.session_state["youtube_job_id"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+        session.run("poll extraction")
+    session.send_messages(args.messages)
+
+
+SCENARIOS = {
+    "main": ("main.py", scenario_main),
+    "for_you": ("pages/For_You_Menu.py", scenario_for_you),
+    "youtube": ("pages/Youtube_Chef.py", scenario_youtube),
+}
+
+
+# --- 3. REPORTING ---
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    index = (len(values) - 1) * p / 100
+    low = int(index)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (index - low)
+
+
+def summarise(samples):
+    times = [s["ms"] for s in samples]
+    peaks = [s["peak_kb"] for s in samples if s["peak_kb"] is not None]
+    summary = {
+        "reruns": len(times),
+        "p50_ms": percentile(times, 50),
+        "p95_ms": percentile(times, 95),
+        "max_ms": max(times) if times else None,
+    }
+    if peaks:
+        summary.update(p50_peak_kb=percentile(peaks, 50), p95_peak_kb=percentile(peaks, 95), max_peak_kb=max(peaks))
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(args):
+    import streamlit
+    from tracing import tracer
+    warmup = None
+    if args.warmup:
+        from warmup import warm_up
+        warmup = warm_up()
+    if args.trace_memory:
+        tracemalloc.start()
+    results = {}
+    for name in args.scenarios:
+        page, scenario = SCENARIOS[name]
+        samples = []
+        for _ in range(args.sessions):
+            session = Session(page, args.trace_memory, args.timeout)
+            scenario(session, args)
+            samples.extend(session.samples)
+        steps = {}
+        for sample in samples:
+            steps.setdefault(sample["step"], []).append(sample)
+        # The very first load pays for imports and cold caches, so it is reported on its own
+        warm = samples[1:]
+        results[name] = dict(summarise(warm), first_load_ms=samples[0]["ms"],
+                             steps={step: summarise(s) for step, s in steps.items()})
+    if args.trace_memory:
+        tracemalloc.stop()
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "settings": {"sessions": args.sessions, "messages": args.messages, "dishes": args.dishes,
+                     "trace_memory": args.trace_memory,
+                     "stub_tokens_per_sec": float(os.environ["CHEF_AI_STUB_TOKENS_PER_SEC"])},
+        # ru_maxrss is in kilobytes on Linux
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "warmup_s": warmup,
+        # Timed by the pages themselves, from before their imports to the end of the page
+        "page_renders": tracer.page_renders(),
+        "scenarios": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """
+    Prints p50/p95 against a saved run and returns the scenarios that got slower than threshold.
+    """
+    regressions = []
+    for name, current in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            ratio = current[key] / before[key] if before.get(key) else None
+            flag = ""
+            if ratio and ratio > 1 + threshold:
+                flag = "  <-- slower"
+                regressions.append(f"{name} {key}")
+            print(f"{name:10} {key}: {before[key]:8.1f} -> {current[key]:8.1f} ms"
+                  + (f" ({ratio:.2f}x)" if ratio else "") + flag)
+    return regressions
+
+
+def print_report(report):
+    print(f"commit {report['commit']}  streamlit {report['streamlit']}  max RSS {report['max_rss_mb']:.0f} MB")
+    if report["warmup_s"]:
+        print("warm-up    " + "  ".join(f"{step} {seconds * 1000:.1f} ms" for step, seconds in report["warmup_s"].items()))
+    for name, summary in report["scenarios"].items():
+        memory = f"  peak p95 {summary['p95_peak_kb']:.0f} KB" if "p95_peak_kb" in summary else ""
+        print(f"{name:10} first {summary['first_load_ms']:8.1f} ms  p50 {summary['p50_ms']:7.1f} ms  "
+              f"p95 {summary['p95_ms']:7.1f} ms  ({summary['reruns']} reruns){memory}")
+        for step, stats in summary["steps"].items():
+            print(f"    {step:16} p50 {stats['p50_ms']:7.1f} ms  p95 {stats['p95_ms']:7.1f} ms  x{stats['reruns']}")
+    for render in report["page_renders"]:
+        print(f"render     {render['page']:10} first {render['first_ms']:8.1f} ms  mean {render['mean_ms']:7.1f} ms  ({render['runs']} runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page reruns with AppTest.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--sessions", type=int, default=5, help="scripted sessions per scenario")
+    parser.add_argument("--messages", type=int, default=3, help="chat messages sent per session")
+    parser.add_argument("--dishes", type=int, default=3, help="dishes picked or bars clicked per session")
+    parser.add_argument("--stub-tokens-per-sec", type=float, default=0,
+                        help="pace of the stub LLM stream (0 = instant, to time only the app)")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false",
+                        help="skip tracemalloc, which slows every rerun down")
+    parser.add_argument("--warmup", action="store_true",
+                        help="run the server-start warm-up (warmup.py) before the first session")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed per rerun")
+    parser.add_argument("--output", help="JSON file to write (default: .cache/benchmarks/bench-<time>.json)")
+    parser.add_argument("--compare", help="earlier JSON run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown that counts as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("CHEF_AI_STUB_TOKENS_PER_SEC", str(args.stub_tokens_per_sec))
+    # A fresh cache directory per run, so snapshots and answer caches from earlier runs don't skew it
+    os.environ.setdefault("CHEF_AI_CACHE_DIR", tempfile.mkdtemp(prefix="chef-ai-bench-"))
+    os.chdir(APP_DIR)
+    sys.path.insert(0, APP_DIR)
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            sys.exit("Slower than the baseline: " + ", ".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
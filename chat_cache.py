@@ -0,0 +1,295 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+import streamlit as st
+
+from ingredients import canonical_ingredient
+from recipe_store import CACHE_DIR
+from tracing import tracer
+
+# --- 1. SETTINGS ---
+CHAT_CACHE_PATH = os.path.join(CACHE_DIR, "chat_cache.sqlite")
+CHAT_CACHE_MAX_ENTRIES = int(os.environ.get("CHEF_AI_CHAT_CACHE_MAX_ENTRIES", 5000))
+CHAT_CACHE_TTL = int(os.environ.get("CHEF_AI_CHAT_CACHE_TTL", 7 * 24 * 3600))
+# Cosine similarity above which a stored question counts as the same question
+SIMILARITY_THRESHOLD = float(os.environ.get("CHEF_AI_SIMILARITY_THRESHOLD", 0.85))
+VECTOR_DIM = 2048
+NGRAM = 3
+
+# Words that only carry the "substitution" intent, folded together so paraphrases match
+SUBSTITUTE_WORDS = {
+    "sub", "subs", "substitute", "substitutes", "substitution", "substitutions", "replace",
+    "replaces", "replacement", "replacements", "instead", "swap", "alternative", "alternatives",
+}
+FILLER_WORDS = {
+    "what", "which", "can", "could", "i", "we", "you", "use", "used", "a", "an", "the", "for", "of",
+    "to", "is", "are", "there", "any", "good", "do", "does", "with", "if", "dont", "don", "t", "have",
+    "please", "me", "my", "in", "this", "recipe", "dish", "it", "be", "should", "would", "best",
+    "something", "anything", "else", "other", "another",
+}
+# The filler words above still decide what kind of answer is wanted: "what is galangal" and
+# "what can I use if I don't have galangal" share a signature but must not share an answer.
+SUBSTITUTE_PATTERN = re.compile(
+    r"\b(?:dont|don t|do not|doesnt|doesn t|havent|haven t|without|out of|ran out|run out)\b"
+    r"|\b(?:can|could|should) (?:i|we) use\b"
+)
+DEFINITION_PATTERN = re.compile(r"^(?:what (?:is|are|s)|whats|define|tell me about)\b|\bmean\b")
+# Words that separate the ingredients named in a question, on top of the filler and substitute words
+QUESTION_WORDS = {
+    "s", "whats", "how", "not", "without", "out", "ran", "run", "doesnt", "havent", "haven",
+    "define", "tell", "about", "mean", "make",
+}
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS answers (
+        dish TEXT NOT NULL,
+        question TEXT NOT NULL,
+        model TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dish, question, model)
+    )
+"""
+LAST_USED_INDEX = "CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers(last_used)"
+
+
+def normalise_question(question):
+    """
+    Folds case, punctuation and spacing so trivially different wordings share one entry.
+    """
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+def question_signature(question):
+    """
+    Reduces a question to its content words, e.g. "sub for galangal?" and
+    "what replaces galangal" both become "substitute galangal".
+    """
+    words = []
+    for word in normalise_question(question).split():
+        if word in SUBSTITUTE_WORDS:
+            word = "substitute"
+        elif word in FILLER_WORDS:
+            continue
+        if not words or words[-1] != word:
+            words.append(word)
+    return " ".join(words)
+
+
+def question_intent(question):
+    """
+    The kind of answer a question asks for: "substitute", "definition", "method" or "other".
+    Only questions of the same kind are compared for similarity.
+    """
+    text = normalise_question(question)
+    if SUBSTITUTE_PATTERN.search(text) or any(word in SUBSTITUTE_WORDS for word in text.split()):
+        return "substitute"
+    if DEFINITION_PATTERN.search(text):
+        return "definition"
+    if text.startswith("how "):
+        return "method"
+    return "other"
+
+
+def question_ingredients(question):
+    """
+    The ingredients a question names, canonicalised and in the order they are mentioned,
+    e.g. "Can I use pork instead of chicken?" gives ("pork", "chicken").
+    """
+    phrases = [[]]
+    for word in normalise_question(question).split():
+        if word in FILLER_WORDS or word in SUBSTITUTE_WORDS or word in QUESTION_WORDS:
+            phrases.append([])
+        else:
+            phrases[-1].append(word)
+    names = (canonical_ingredient(" ".join(phrase)) for phrase in phrases if phrase)
+    return tuple(dict.fromkeys(name for name in names if name))
+
+
+def question_key(question):
+    """
+    What two questions must share before their wording is compared: the kind of answer
+    wanted and the ingredients named. A swap must also go the same way, so "pork instead
+    of chicken" keeps its order while "what is galangal" only needs the same set.
+    """
+    intent = question_intent(question)
+    ingredients = question_ingredients(question)
+    return intent, ingredients if intent == "substitute" else tuple(sorted(ingredients))
+
+
+def question_vector(question):
+    """
+    Hashed character n-gram counts of the question signature, L2-normalised.
+    """
+    text = f" {question_signature(question)} "
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for i in range(len(text) - NGRAM + 1):
+        vector[zlib.crc32(text[i:i + NGRAM].encode()) % VECTOR_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SimilarQuestions:
+    """
+    Question vectors of one (dish, model), stacked in a matrix so one
+    matrix-vector product scores every stored question at once.
+    """
+    def __init__(self, questions):
+        self.questions = list(questions)
+        self.keys = [question_key(q) for q in self.questions]
+        if self.questions:
+            self.matrix = np.vstack([question_vector(q) for q in self.questions])
+        else:
+            self.matrix = np.zeros((0, VECTOR_DIM), dtype=np.float32)
+
+    def add(self, question):
+        if question in self.questions:
+            return
+        self.questions.append(question)
+        self.keys.append(question_key(question))
+        self.matrix = np.vstack([self.matrix, question_vector(question)])
+
+    def best_match(self, question):
+        """
+        The most similar stored question asking for the same kind of answer about the same
+        ingredients, and its score.
+        """
+        if not self.questions:
+            return None, 0.0
+        key = question_key(question)
+        same = np.fromiter((k == key for k in self.keys), dtype=bool, count=len(self.keys))
+        scores = np.where(same, self.matrix @ question_vector(question), -1.0)
+        best = int(np.argmax(scores))
+        if scores[best] < 0:
+            return None, 0.0
+        return self.questions[best], float(scores[best])
+
+
+# --- 2. CACHE ---
+class AnswerCache:
+    """
+    On-disk answer cache keyed by (dish, normalised question, model),
+    with a time-to-live and least-recently-used eviction.
+    Questions that miss exactly can still match a sufficiently similar stored question.
+    """
+    def __init__(self, path=CHAT_CACHE_PATH, max_entries=CHAT_CACHE_MAX_ENTRIES, ttl=CHAT_CACHE_TTL,
+                 threshold=SIMILARITY_THRESHOLD):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._similar = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(SCHEMA)
+        self._db.execute(LAST_USED_INDEX)
+        self._stats = {"hits": 0, "similar_hits": 0, "misses": 0, "expired": 0, "stores": 0, "evictions": 0}
+
+    def get(self, dish, question, model):
+        """
+        Returns the stored answer for the exact question, or for the closest
+        stored question of the same dish if it is similar enough.
+        """
+        with self._lock:
+            answer = self._get_exact(dish, normalise_question(question), model)
+            if answer is not None:
+                self._stats["hits"] += 1
+                return answer
+            match, score = self._similar_questions(dish, model).best_match(question)
+            if match is not None and score >= self.threshold:
+                answer = self._get_exact(dish, match, model)
+                if answer is not None:
+                    self._stats["similar_hits"] += 1
+                    return answer
+            self._stats["misses"] += 1
+            return None
+
+    def _similar_questions(self, dish, model):
+        if (dish, model) not in self._similar:
+            rows = self._db.execute("SELECT question FROM answers WHERE dish = ? AND model = ?", (dish, model))
+            self._similar[(dish, model)] = SimilarQuestions(row[0] for row in rows)
+        return self._similar[(dish, model)]
+
+    def _get_exact(self, dish, question, model):
+        key = (dish, question, model)
+        now = time.time()
+        row = self._db.execute(
+            "SELECT answer, created_at FROM answers WHERE dish = ? AND question = ? AND model = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        answer, created_at = row
+        if now - created_at > self.ttl:
+            self._db.execute("DELETE FROM answers WHERE dish = ? AND question = ? AND model = ?", key)
+            self._similar.pop((dish, model), None)
+            self._stats["expired"] += 1
+            return None
+        self._db.execute(
+            "UPDATE answers SET last_used = ?, hits = hits + 1 WHERE dish = ? AND question = ? AND model = ?",
+            (now,) + key,
+        )
+        return answer
+
+    def put(self, dish, question, model, answer):
+        if not answer:
+            return
+        now = time.time()
+        question = normalise_question(question)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (dish, question, model, answer, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (dish, question, model, answer, now, now),
+            )
+            self._stats["stores"] += 1
+            if (dish, model) in self._similar:
+                self._similar[(dish, model)].add(question)
+            self._evict()
+
+    def _evict(self):
+        expired = self._db.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+        count = self._db.execute("SELECT count(*) FROM answers").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM answers WHERE rowid IN (SELECT rowid FROM answers ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self._stats["evictions"] += excess
+        if expired > 0 or excess > 0:
+            # Evicted questions must stop matching; the vectors are rebuilt on the next lookup
+            self._similar.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._db.execute("SELECT count(*) FROM answers").fetchone()[0]
+        lookups = stats["hits"] + stats["similar_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["similar_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+@st.cache_resource
+def get_answer_cache():
+    cache = AnswerCache()
+    # Hits, misses, evictions and hit rate, in the debug panel and /metrics
+    tracer.register_gauges("answer_cache", cache.stats)
+    return cache
+
+
+def replay_answer(answer, chunk_words=8):
+    """
+    Streams a cached answer back in small chunks, so st.write_stream renders it like a live reply.
+    """
+    words = answer.split(" ")
+    for i in range(0, len(words), chunk_words):
+        yield " ".join(words[i:i + chunk_words]) + (" " if i + chunk_words < len(words) else "")
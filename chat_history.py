@@ -0,0 +1,97 @@
+import os
+
+import streamlit as st
+
+from llm_backend import estimate_tokens
+
+# --- 1. SETTINGS ---
+HISTORY_TOKEN_BUDGET = int(os.environ.get("CHEF_AI_HISTORY_TOKEN_BUDGET", 1500))
+HISTORY_KEEP_MESSAGES = int(os.environ.get("CHEF_AI_HISTORY_KEEP_MESSAGES", 6))
+# Older messages are folded in batches, so the summary call runs every few turns, not every turn
+HISTORY_FOLD_BATCH = int(os.environ.get("CHEF_AI_HISTORY_FOLD_BATCH", 4))
+SUMMARY_MAX_WORDS = 150
+
+SUMMARY_INSTRUCTION = (
+    "Role: You keep notes for a Thai cooking assistant. "
+    f"Task: Summarise the conversation below in at most {SUMMARY_MAX_WORDS} words. "
+    "Keep every ingredient substitution, quantity and decision the user made; drop greetings and small talk."
+)
+
+
+def message_tokens(messages):
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+
+def _fallback_summary(previous, messages):
+    """
+    Used when the summary call fails: keeps the start of each folded message.
+    """
+    lines = [previous] if previous else []
+    for m in messages:
+        who = "User" if m["role"] == "user" else "Chef"
+        lines.append(f"{who}: {' '.join(m['content'].split()[:30])}")
+    words = " ".join(lines).split()
+    return " ".join(words[-SUMMARY_MAX_WORDS * 2:])
+
+
+def _summarise(llm, previous, messages):
+    transcript = "\n".join(
+        f"{'User' if m['role'] == 'user' else 'Chef'}: {m['content']}" for m in messages
+    )
+    if previous:
+        transcript = f"Earlier summary: {previous}\n\n{transcript}"
+    try:
+        return llm.generate([{"role": "user", "content": transcript}], system_instruction=SUMMARY_INSTRUCTION)
+    except Exception:
+        return _fallback_summary(previous, messages)
+
+
+# --- 2. WINDOWING ---
+def window_history(messages, llm, state_key, budget=HISTORY_TOKEN_BUDGET, keep_last=HISTORY_KEEP_MESSAGES, offset=0):
+    """
+    Returns (messages to send, summary of older turns, estimated prompt tokens).
+
+    At least the last `keep_last` messages are sent verbatim (fewer if they exceed the token
+    budget). Everything older is folded into a running summary kept in session state, so each
+    message is summarised once and the prompt stays roughly the same size however long
+    the conversation gets.
+
+    `offset` is how many messages were already trimmed off the front of `messages` by the
+    session store; the fold position is kept relative to the messages still there.
+    """
+    state = st.session_state.get(state_key)
+    if state is None or offset < state.get("offset", 0):
+        state = {"folded": 0, "summary": "", "offset": offset}
+    elif offset > state.get("offset", 0):
+        state = dict(state, folded=max(state["folded"] - (offset - state.get("offset", 0)), 0), offset=offset)
+    if state["folded"] > len(messages):
+        state = {"folded": 0, "summary": "", "offset": offset}
+
+    start = state["folded"]
+    if len(messages) - start > keep_last + HISTORY_FOLD_BATCH or message_tokens(messages[start:]) > budget:
+        start = max(len(messages) - keep_last, start)
+    # Always keep the newest message, even if it alone is over budget
+    while start < len(messages) - 1 and message_tokens(messages[start:]) > budget:
+        start += 1
+
+    if start > state["folded"]:
+        state = {
+            "folded": start,
+            "summary": _summarise(llm, state["summary"], messages[state["folded"]:start]),
+            "offset": offset,
+        }
+    st.session_state[state_key] = state
+
+    recent = messages[start:]
+    prompt_tokens = message_tokens(recent) + estimate_tokens(state["summary"])
+    return recent, state["summary"], prompt_tokens
+
+
+def with_summary(system_instruction, summary):
+    if not summary:
+        return system_instruction
+    return f"{system_instruction}\n\nSummary of the earlier conversation: {summary}"
+
+
+def reset_history(state_key):
+    st.session_state.pop(state_key, None)
@@ -1,139 +1,23 @@
 import streamlit as st
-from google import genai
-from google.genai import types
-
-def inject_food_theme():
-    """
-    Injects global CSS for the Food/Recipe Theme and handles Light/Dark mode toggling.
-    """
-    # --- 1. THEME TOGGLE LOGIC ---
-    if 'dark_mode' not in st.session_state:
-        st.session_state.dark_mode = False # Default to Dark Mode for better initial impression
-
-    with st.sidebar:
-        st.session_state.dark_mode = st.toggle("🌙 Dark Mode", value=st.session_state.dark_mode)
-
-    # --- 2. DEFINE COLORS BASED ON MODE ---
-    if st.session_state.dark_mode:
-        # DARK MODE PALETTE
-        bg_color = "#121212"            # Deep Dark Background
-        sidebar_bg = "#1E1E1E"          # Dark Sidebar
-        text_color = "#E0E0E0"          # Light Grey Text (Readable)
-        header_color = "#FF9F43"        # Bright Orange for Headers
-        
-        # Specific fix for Inputs and Cards
-        card_bg = "#2C2C2C"             
-        input_bg = "#333333"            
-        input_border = "#555555"
-        
-        # Link Colors
-        link_text_color = "#FFD700"     # Gold for links/buttons in dark mode
-    else:
-        # LIGHT MODE PALETTE
-        bg_color = "#FFFFFF"
-        sidebar_bg = "#FEF9E7"          # Cream Sidebar
-        text_color = "#2C3E50"          # Dark Blue-Grey Text
-        header_color = "#D35400"        # Pumpkin Spice
-        
-        card_bg = "#FFF5E6"             # Very Light Orange
-        input_bg = "#FFFFFF"
-        input_border = "#F5B041"
-        
-        link_text_color = "#D35400"     # Dark Orange for links
-
-    # --- 3. INJECT STRONGER DYNAMIC CSS ---
-    st.markdown(f"""
-    <style>
-        /* IMPORT FONTS */
-        @import url('https://fonts.googleapis.com/css2?family=Merriweather:wght@700;900&family=Lato:wght@400;700&display=swap');
-
-        /* MAIN APP COLORS */
-        .stApp {{
-            background-color: {bg_color};
-            color: {text_color};
-            font-family: 'Lato', sans-serif;
-        }}
-        
-        /* HEADERS */
-        h1, h2, h3, .stMarkdown h1, .stMarkdown h2, .stMarkdown h3 {{
-            font-family: 'Merriweather', serif !important;
-            color: {header_color} !important;
-        }}
-        
-        /* TEXT COLOR OVERRIDES (Fixes grey text in dark mode) */
-        p, .stMarkdown, .stText, label {{
-            color: {text_color} !important;
-        }}
-
-        /* --- FIX: PAGE LINK / BUTTON TEXT VISIBILITY --- */
-        /* This specifically targets the text inside st.page_link to ensure it's visible */
-        .stPageLink a p {{
-            color: {link_text_color} !important;
-            font-weight: 700 !important;
-            font-size: 1.1rem !important;
-        }}
-        /* Icon color inside page link */
-        .stPageLink a span {{
-             color: {text_color} !important;
-        }}
-        /* Hover effect for page links */
-        .stPageLink a:hover {{
-            background-color: rgba(230, 126, 34, 0.2) !important;
-            border-radius: 8px;
-        }}
-
-        /* --- FIX: INPUT FIELDS (Youtube & Chat) --- */
-        /* Forces background and text color for inputs */
-        .stTextInput input, .stSelectbox div[data-baseweb="select"] {{
-            background-color: {input_bg} !important;
-            color: {text_color} !important;
-            border: 1px solid {input_border} !important;
-        }}
-        /* Placeholder text color */
-        ::placeholder {{
-            color: {text_color} !important;
-            opacity: 0.5;
-        }}
-
-        /* SIDEBAR */
-        [data-testid="stSidebar"] {{
-            background-color: {sidebar_bg};
-            border-right: 1px solid {input_border};
-        }}
-        
-        /* CARDS / CONTAINERS */
-        div[data-testid="stVerticalBlock"] > div[style*="flex-direction: column;"] > div[data-testid="stVerticalBlock"] {{
-            background-color: {card_bg};
-            border-radius: 12px;
-            border: 1px solid {input_border};
-            padding: 15px;
-        }}
-        
-        /* BUTTONS */
-        .stButton > button {{
-            background-color: #E67E22;
-            color: white !important;
-            border: none;
-            border-radius: 8px;
-            font-weight: bold;
-        }}
-        .stButton > button:hover {{
-            background-color: #D35400;
-        }}
-    </style>
-    """, unsafe_allow_html=True)
+from chat_cache import get_answer_cache, replay_answer
+from llm_backend import get_llm_backend, estimate_tokens
+from chat_history import window_history, with_summary
+from session_store import load_chat, chat_offset, append_message, pop_message, reset_chat
 
+@st.fragment
 def render_ai_chat(dish_data):
     """
     Renders the AI Chat interface based on the provided recipe data.
+    Runs as a fragment: sending a message reruns only this panel, with the dish_data
+    it was last given, instead of the whole page.
     """
-    # Configuration for Gemini
-    GEMINI_MODEL = "gemini-2.5-flash"
-    
     # Access recipe data passed from main.py
     dish_name = dish_data.get("name", "")
     dish_ingredients = dish_data.get("ingredients", "No ingredients selected.")
     dish_instructions = dish_data.get("instructions", "No instructions selected.")
+    # Optional extra context, e.g. what the cook is missing when the dish came from a pantry match
+    dish_notes = dish_data.get("notes", "")
+    notes_line = f"\n                Cook_Notes: **{dish_notes}**" if dish_notes else ""
 
     st.divider()
 
@@ -154,7 +38,7 @@ def render_ai_chat(dish_data):
     )
     
     try:
-        gemini_client = genai.Client(api_key=st.secrets.connections.geminiapi["GEMINI_API_KEY"])
+        llm = get_llm_backend()
     except (AttributeError, KeyError):
         st.error("Gemini API key not found in secrets.")
         return 
@@ -169,11 +53,12 @@ def render_ai_chat(dish_data):
     Recipe_Data:
                 Name: **{dish_name}**
                 Ingredients: **{dish_ingredients}**
-                Instructions: **{dish_instructions}**
+                Instructions: **{dish_instructions}**{notes_line}
     Guidelines: **Substitution Protocol:** When a user asks for a substitution, or when you proactively suggest one, you must explicitly state the original, authentic Thai ingredient and its recommended substitute, followed by a brief, specific explanation of *why* the substitute works (e.g., 'substituting palm sugar with brown sugar for its molasses notes and soft texture').,
                 **Accuracy and Flavor Integrity:** Only propose substitutions that maintain the essential balance (spicy, sour, sweet, salty) and core character of the Thai dish. If a perfect substitution is impossible, explain the compromise or nearest achievable flavor profile.,
                 **Instruction Modification:** If an ingredient substitution necessitates a change to the original cooking instructions (e.g., a change in cooking time or technique), you must detail the revised instruction step clearly to ensure the ‘better version’ of the dish is achieved.,
                 **Technique Explanations:** When discussing cooking techniques, use specific, detailed language (e.g., temperature control, oil choice, wok movement) to enhance the user’s understanding.
+                **Cook Notes:** If Cook_Notes are given, tailor the recipe to them from the first answer (e.g. use the substitutes they will cook with and work around what they do not have).
     Constraints: Maintain the expert Thai chef persona at all times.,
                 All responses must be written in English (United Kingdom).,
                 Do not fabricate culinary facts, ingredient interactions, or nonexistent techniques (avoiding hallucinations). If you lack sufficient information, state what additional detail is needed.,
@@ -181,48 +66,61 @@ def render_ai_chat(dish_data):
                 Do not talk or give facts about other information other than cooking/Thailand. Try to sway the users back to culinary.
     """
 
-    if 'chat_messages' not in st.session_state:
-        st.session_state.chat_messages = [{"role": "model", "content": "Hello! I am your personal AI chef. How can I help you with your cooking today?"}]
+    # The history lives in the server-side session store, not in session state
+    chat_messages = load_chat("chat_messages")
+    if not chat_messages:
+        chat_messages = [{"role": "model", "content": "Hello! I am your personal AI chef. How can I help you with your cooking today?"}]
+        reset_chat("chat_messages", chat_messages)
         
-    for message in st.session_state.chat_messages:
+    for message in chat_messages:
         with st.chat_message(message['role']):
             st.markdown(message['content'])
 
     if prompt := st.chat_input('Ask Anything..'):
-        st.session_state.chat_messages.append({'role':'user','content':prompt})
+        append_message("chat_messages", 'user', prompt)
+        # Re-read, since storing the message may have trimmed the oldest ones to stay under the cap
+        chat_messages = load_chat("chat_messages")
+        offset = chat_offset("chat_messages")
         with st.chat_message('user'):
             st.write(prompt)
             
         with st.chat_message('model'):
-            gemini_history = []
-            for message in st.session_state.chat_messages:
-                role = "user" if message["role"] == "user" else "model"
-                gemini_history.append(types.Content(role=role, parts=[types.Part(text=message["content"])]))
-                
+            # Opening questions don't depend on earlier turns, so their answers can be shared
+            answer_cache = get_answer_cache()
+            is_opening_question = offset == 0 and sum(1 for m in chat_messages if m['role'] == 'user') == 1
+            cached_answer = answer_cache.get(dish_name + notes_line, prompt, llm.model) if is_opening_question else None
+            if cached_answer:
+                st.write_stream(replay_answer(cached_answer))
+                append_message("chat_messages", 'model', cached_answer)
+                return
+
             try:
-                response_stream = gemini_client.models.generate_content_stream(
-                    model=GEMINI_MODEL, 
-                    contents=gemini_history,
-                    config=types.GenerateContentConfig(
-                        system_instruction=system_instruction,
-                        thinking_config=types.ThinkingConfig(thinking_budget=0)
-                    )
+                # Only recent turns go out verbatim; older ones travel as a running summary
+                history, summary, prompt_tokens = window_history(
+                    chat_messages, llm, "chat_history_window", offset=offset
+                )
+                response_stream = llm.stream(
+                    history,
+                    system_instruction=with_summary(system_instruction, summary),
+                    thinking_budget=0
                 )
                 
                 response_content = ''
                 
                 def stream_and_accumulate(stream_response):
                     nonlocal response_content
-                    for chunk in stream_response:
-                        text = chunk.text
+                    for text in stream_response:
                         response_content += text
                         yield text
                         
                 stream = stream_and_accumulate(response_stream)
                 st.write_stream(stream)
                 
-                st.session_state.chat_messages.append({'role':'model','content':response_content})
+                append_message("chat_messages", 'model', response_content)
+                st.caption(f"Prompt size: ~{prompt_tokens + estimate_tokens(system_instruction)} tokens")
+                if is_opening_question:
+                    answer_cache.put(dish_name + notes_line, prompt, llm.model, response_content)
 
             except Exception as e:
                 st.error(f"Chatbot Error: {e}")
-                st.session_state.chat_messages.pop()
+                pop_message("chat_messages")
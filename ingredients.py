@@ -0,0 +1,170 @@
+import os
+import re
+
+import pandas as pd
+
+from recipe_store import CACHE_DIR
+
+# --- 1. VOCABULARY ---
+UNITS = {
+    "g": "g", "gram": "g", "grams": "g", "gm": "g",
+    "kg": "kg", "kilogram": "kg", "kilograms": "kg",
+    "ml": "ml", "millilitre": "ml", "milliliter": "ml", "millilitres": "ml", "milliliters": "ml",
+    "l": "l", "litre": "l", "liter": "l", "litres": "l", "liters": "l",
+    "tbsp": "tbsp", "tbs": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "tsp": "tsp", "teaspoon": "tsp", "teaspoons": "tsp",
+    "cup": "cup", "cups": "cup",
+    "oz": "oz", "ounce": "oz", "ounces": "oz", "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "clove": "clove", "cloves": "clove",
+    "stalk": "stalk", "stalks": "stalk", "stem": "stalk", "stems": "stalk",
+    "slice": "slice", "slices": "slice",
+    "piece": "piece", "pieces": "piece", "pc": "piece", "pcs": "piece",
+    "leaf": "leaf", "leaves": "leaf",
+    "pinch": "pinch", "handful": "handful", "bunch": "bunch", "can": "can", "cans": "can",
+    "sprig": "sprig", "sprigs": "sprig",
+}
+PREP_WORDS = {
+    "chopped", "finely", "roughly", "minced", "sliced", "thinly", "diced", "crushed", "fresh",
+    "dried", "ground", "grated", "peeled", "large", "small", "medium", "whole", "optional",
+    "to", "taste", "about", "of", "pounded", "bruised", "shredded", "cut", "into", "pieces",
+}
+# Spelling variants that should land on the same canonical ingredient
+ALIASES = {
+    "chili": "chilli", "chile": "chilli", "chilies": "chilli", "chillies": "chilli", "chilis": "chilli",
+    "makrut lime leaf": "kaffir lime leaf", "kaffir lime leaves": "kaffir lime leaf",
+    "lime leaf": "kaffir lime leaf", "lemon grass": "lemongrass", "coriander leaf": "coriander",
+    "cilantro": "coriander", "prawn": "prawn", "shrimp": "prawn", "scallion": "spring onion",
+    "green onion": "spring onion", "thai basil": "sweet basil", "nam pla": "fish sauce",
+}
+# Readily available stand-ins for Thai ingredients, by canonical name, best first
+SUBSTITUTES = {
+    "palm sugar": ["brown sugar", "sugar"],
+    "sugar": ["brown sugar", "palm sugar"],
+    "fish sauce": ["light soy sauce", "soy sauce"],
+    "oyster sauce": ["soy sauce"],
+    "kaffir lime leaf": ["lime zest"],
+    "galangal": ["ginger"],
+    "lemongrass": ["lemon zest"],
+    "holy basil leaf": ["sweet basil leaf", "basil"],
+    "sweet basil leaf": ["basil", "holy basil leaf"],
+    "bird's eye chilli": ["red chilli", "chilli flake", "chilli"],
+    "tamarind paste": ["lime juice"],
+    "lime juice": ["lemon juice"],
+    "coconut milk": ["coconut cream", "evaporated milk"],
+    "thai eggplant": ["eggplant", "zucchini"],
+    "green papaya": ["cucumber", "carrot"],
+    "rice noodle": ["egg noodle", "spaghetti"],
+    "straw mushroom": ["button mushroom", "mushroom"],
+    "shallot": ["red onion", "onion"],
+    "coriander": ["parsley"],
+    "roasted peanut": ["peanut", "cashew"],
+    "peanut": ["roasted peanut", "cashew"],
+    "firm tofu": ["tofu"],
+    "vegetable oil": ["sunflower oil", "canola oil", "olive oil"],
+    "chicken stock": ["vegetable stock", "water"],
+}
+IRREGULAR_PLURALS = {"leaves": "leaf", "tomatoes": "tomato", "potatoes": "potato", "shallots": "shallot"}
+FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 0.125}
+
+QUANTITY_PATTERN = re.compile(
+    r"^\s*(?P<qty>\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?|[½¼¾⅓⅔⅛])"
+    r"(?:\s*[-–]\s*(?:\d+(?:\.\d+)?|\d+/\d+))?\s*"
+)
+
+
+# --- 2. PARSING ---
+def parse_quantity(text):
+    text = text.strip()
+    if text in FRACTIONS:
+        return FRACTIONS[text]
+    total = 0.0
+    for part in text.split():
+        if "/" in part:
+            num, den = part.split("/")
+            total += float(num) / float(den) if float(den) else 0.0
+        else:
+            total += float(part)
+    return total
+
+
+def canonical_ingredient(text):
+    """
+    Reduces free text such as "5 cloves garlic, finely chopped" to a canonical name ("garlic").
+    """
+    text = re.sub(r"\(.*?\)", " ", text.lower())
+    text = text.split(",")[0]
+    words = [w for w in re.findall(r"[\w']+", text) if w not in PREP_WORDS and not w.isdigit()]
+    name = " ".join(words)
+    if name in ALIASES:
+        return ALIASES[name]
+    words = [ALIASES.get(w, w) for w in words]
+    if words:
+        last = words[-1]
+        if last in IRREGULAR_PLURALS:
+            words[-1] = IRREGULAR_PLURALS[last]
+        elif len(last) > 4 and last.endswith("ies"):
+            words[-1] = last[:-3] + "y"
+        elif len(last) > 3 and last.endswith("s") and not last.endswith("ss"):
+            words[-1] = last[:-1]
+    name = " ".join(words)
+    return ALIASES.get(name, name)
+
+
+def parse_line(line):
+    """
+    Splits one condiments line into (quantity, unit, canonical ingredient).
+    Lines without a recognisable amount keep quantity and unit as None.
+    """
+    quantity = None
+    unit = None
+    rest = line.strip().lstrip("-•* ")
+    match = QUANTITY_PATTERN.match(rest)
+    if match:
+        quantity = parse_quantity(match.group("qty"))
+        rest = rest[match.end():]
+        first, _, remainder = rest.partition(" ")
+        key = first.lower().rstrip(".")
+        if key in UNITS:
+            unit = UNITS[key]
+            rest = remainder
+    return quantity, unit, canonical_ingredient(rest)
+
+
+def parse_recipes(df):
+    """
+    Parses every condiments entry into one row per ingredient line.
+    recipe_id follows the row order of df, starting at 1, to match the recipes table.
+    """
+    rows = []
+    for recipe_id, condiments in enumerate(df["condiments"], start=1):
+        if pd.isna(condiments):
+            continue
+        position = 0
+        for line in str(condiments).split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            position += 1
+            quantity, unit, ingredient = parse_line(line)
+            rows.append((recipe_id, position, quantity, unit, ingredient, line))
+    return pd.DataFrame(rows, columns=["recipe_id", "position", "quantity", "unit", "ingredient", "line"])
+
+
+def load_ingredient_table(df, version):
+    """
+    Returns the parsed ingredient table for a dataset version, parsing only on the first call.
+    """
+    path = os.path.join(CACHE_DIR, f"ingredients-{version}.parquet")
+    if os.path.exists(path):
+        try:
+            return pd.read_parquet(path)
+        except Exception:
+            pass
+    table = parse_recipes(df.reset_index(drop=True))
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for old in os.listdir(CACHE_DIR):
+        if old.startswith("ingredients-") and old.endswith(".parquet"):
+            os.remove(os.path.join(CACHE_DIR, old))
+    table.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return table
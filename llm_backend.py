@@ -0,0 +1,410 @@
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+
+from rate_limit import TokenBucket, RequestQueue, QueueFullError, INTERACTIVE, BACKGROUND
+from tracing import record_llm_call, tracer
+
+# --- 1. SETTINGS ---
+# CHEF_AI_LLM_BACKEND=stub swaps Gemini for a local deterministic backend (load tests, CI).
+LLM_BACKEND = os.environ.get("CHEF_AI_LLM_BACKEND", "gemini")
+DEFAULT_MODEL = "gemini-2.5-flash"
+LLM_TIMEOUT = float(os.environ.get("CHEF_AI_LLM_TIMEOUT", 60))
+LLM_RETRIES = int(os.environ.get("CHEF_AI_LLM_RETRIES", 3))
+LLM_BACKOFF = float(os.environ.get("CHEF_AI_LLM_BACKOFF", 0.5))
+STUB_TOKENS_PER_SEC = float(os.environ.get("CHEF_AI_STUB_TOKENS_PER_SEC", 50))
+# Process-wide limit on upstream calls: requests per second, burst size, and how many may queue for a slot
+LLM_RATE = float(os.environ.get("CHEF_AI_LLM_RATE", 4.0))
+LLM_BURST = int(os.environ.get("CHEF_AI_LLM_BURST", 8))
+LLM_QUEUE_SIZE = int(os.environ.get("CHEF_AI_LLM_QUEUE_SIZE", 64))
+LLM_QUEUE_TIMEOUT = float(os.environ.get("CHEF_AI_LLM_QUEUE_TIMEOUT", 30))
+# Batch work (playlist imports) queues behind every chat call and is held to a share of the
+# rate, so the rest of the budget stays free for people waiting on a reply
+LLM_BACKGROUND_RATE = float(os.environ.get("CHEF_AI_LLM_BACKGROUND_RATE", 1.0))
+LLM_BACKGROUND_BURST = int(os.environ.get("CHEF_AI_LLM_BACKGROUND_BURST", 2))
+LLM_BACKGROUND_TIMEOUT = float(os.environ.get("CHEF_AI_LLM_BACKGROUND_TIMEOUT", 600))
+
+# HTTP status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def get_model_name():
+    """
+    Model name from secrets ([connections.geminiapi] GEMINI_MODEL), falling back to the default.
+    """
+    try:
+        return st.secrets.connections.geminiapi.get("GEMINI_MODEL", DEFAULT_MODEL)
+    except Exception:
+        return DEFAULT_MODEL
+
+
+def estimate_tokens(text):
+    # Rough rule of thumb for English: one token per four characters
+    return max(1, len(text) // 4) if text else 0
+
+
+# --- 2. METRICS ---
+class CallMetrics:
+    """
+    Per-process counters plus a short history of recent calls for the debug views.
+    """
+    def __init__(self, history=200):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+        self._totals = {"calls": 0, "errors": 0, "retries": 0, "latency_total": 0.0,
+                        "prompt_tokens": 0, "output_tokens": 0}
+
+    def record(self, kind, model, latency, first_chunk, prompt_tokens, output_tokens, error=None):
+        call = {
+            "kind": kind, "model": model, "latency": latency, "first_chunk": first_chunk,
+            "prompt_tokens": prompt_tokens, "output_tokens": output_tokens,
+            "error": error, "at": time.time(),
+        }
+        with self._lock:
+            self._recent.append(call)
+            self._totals["calls"] += 1
+            self._totals["latency_total"] += latency
+            self._totals["prompt_tokens"] += prompt_tokens or 0
+            self._totals["output_tokens"] += output_tokens or 0
+            if error:
+                self._totals["errors"] += 1
+        record_llm_call(kind, model, latency, first_chunk, output_tokens, error)
+
+    def record_retry(self):
+        with self._lock:
+            self._totals["retries"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._totals)
+            stats["recent"] = list(self._recent)
+        stats["latency_avg"] = stats["latency_total"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
+
+
+# --- 3. BACKENDS ---
+class LLMBackend:
+    """
+    Common interface: messages are [{"role": "user" | "model", "content": str}, ...].
+    """
+    name = "base"
+
+    def __init__(self, model):
+        self.model = model
+        self.metrics = CallMetrics()
+
+    def generate(self, messages, system_instruction=None, thinking_budget=None):
+        return "".join(self.stream(messages, system_instruction, thinking_budget))
+
+    def stream(self, messages, system_instruction=None, thinking_budget=None):
+        raise NotImplementedError
+
+    def stats(self):
+        return dict(self.metrics.stats(), backend=self.name, model=self.model)
+
+
+class GeminiBackend(LLMBackend):
+    """
+    One shared genai client per process, with a request timeout and
+    exponential backoff on rate limits and transient server errors.
+    """
+    name = "gemini"
+
+    def __init__(self, api_key, model, timeout=LLM_TIMEOUT, retries=LLM_RETRIES, backoff=LLM_BACKOFF):
+        super().__init__(model)
+        from google import genai
+        from google.genai import types
+        self._types = types
+        self.retries = retries
+        self.backoff = backoff
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(timeout=int(timeout * 1000)),
+        )
+
+    def _contents(self, messages):
+        types = self._types
+        return [
+            types.Content(role="user" if m["role"] == "user" else "model", parts=[types.Part(text=m["content"])])
+            for m in messages
+        ]
+
+    def _config(self, system_instruction, thinking_budget):
+        types = self._types
+        options = {"system_instruction": system_instruction}
+        if thinking_budget is not None:
+            options["thinking_config"] = types.ThinkingConfig(thinking_budget=thinking_budget)
+        return types.GenerateContentConfig(**options)
+
+    def _is_retryable(self, error):
+        code = getattr(error, "code", None) or getattr(error, "status_code", None)
+        if code in RETRYABLE_CODES:
+            return True
+        return isinstance(error, (TimeoutError, ConnectionError)) or "timeout" in type(error).__name__.lower()
+
+    def _sleep_before_retry(self, attempt):
+        self.metrics.record_retry()
+        time.sleep(self.backoff * (2 ** attempt) * (1 + random.random() * 0.25))
+
+    def stream(self, messages, system_instruction=None, thinking_budget=None):
+        contents = self._contents(messages)
+        config = self._config(system_instruction, thinking_budget)
+        start = time.perf_counter()
+        first_chunk = None
+        output = []
+        usage = None
+        attempt = 0
+        while True:
+            try:
+                for chunk in self.client.models.generate_content_stream(
+                    model=self.model, contents=contents, config=config
+                ):
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    if chunk.text:
+                        if first_chunk is None:
+                            first_chunk = time.perf_counter() - start
+                        output.append(chunk.text)
+                        yield chunk.text
+                break
+            except Exception as e:
+                # Once text has reached the page a retry would repeat it, so only retry before that
+                if output or attempt >= self.retries or not self._is_retryable(e):
+                    self.metrics.record("stream", self.model, time.perf_counter() - start, first_chunk,
+                                        None, None, error=str(e))
+                    raise
+                self._sleep_before_retry(attempt)
+                attempt += 1
+
+        text = "".join(output)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        output_tokens = getattr(usage, "candidates_token_count", None)
+        self.metrics.record("stream", self.model, time.perf_counter() - start, first_chunk,
+                            prompt_tokens or estimate_tokens(str(system_instruction) + str(messages)),
+                            output_tokens or estimate_tokens(text))
+
+    def generate(self, messages, system_instruction=None, thinking_budget=None):
+        contents = self._contents(messages)
+        config = self._config(system_instruction, thinking_budget)
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self.client.models.generate_content(model=self.model, contents=contents, config=config)
+                break
+            except Exception as e:
+                if attempt >= self.retries or not self._is_retryable(e):
+                    self.metrics.record("generate", self.model, time.perf_counter() - start, None,
+                                        None, None, error=str(e))
+                    raise
+                self._sleep_before_retry(attempt)
+                attempt += 1
+
+        latency = time.perf_counter() - start
+        usage = getattr(response, "usage_metadata", None)
+        text = response.text or ""
+        self.metrics.record("generate", self.model, latency, latency,
+                            getattr(usage, "prompt_token_count", None) or estimate_tokens(str(messages)),
+                            getattr(usage, "candidates_token_count", None) or estimate_tokens(text))
+        return text
+
+
+STUB_REPLIES = [
+    "A good substitute here is fresh ginger with a little lime zest. It keeps the sharp, citrusy "
+    "heat of the original, so reduce the amount by a third and add it at the same stage of cooking.",
+    "You can use brown sugar instead of palm sugar. It brings similar molasses notes, but it is "
+    "slightly sweeter, so start with three quarters of the amount and taste as you go.",
+    "Fish sauce can be replaced with light soy sauce and a pinch of salt. You lose a little depth, "
+    "so a few drops of Worcestershire sauce help bring back the savoury note.",
+]
+STUB_RECIPE = (
+    "# Stub Recipe\n\n## Ingredients\n- 200 g chicken\n- 2 tbsp fish sauce\n- 1 tsp palm sugar\n\n"
+    "## Instructions\n1. Stir-fry the chicken until cooked.\n2. Season with fish sauce and palm sugar."
+)
+
+
+class StubBackend(LLMBackend):
+    """
+    Offline backend that streams canned text at a fixed rate.
+    The reply is chosen from a hash of the conversation, so runs are repeatable.
+    """
+    name = "stub"
+
+    def __init__(self, model, tokens_per_sec=STUB_TOKENS_PER_SEC):
+        super().__init__(model)
+        self.delay = 1.0 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+
+    def _reply(self, messages, system_instruction):
+        if system_instruction and "extract the recipe" in system_instruction.lower():
+            return STUB_RECIPE
+        key = hashlib.sha1((str(system_instruction) + str(messages)).encode()).digest()
+        return STUB_REPLIES[key[0] % len(STUB_REPLIES)]
+
+    def stream(self, messages, system_instruction=None, thinking_budget=None):
+        start = time.perf_counter()
+        first_chunk = None
+        text = self._reply(messages, system_instruction)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if self.delay:
+                time.sleep(self.delay)
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            yield word + (" " if i < len(words) - 1 else "")
+        self.metrics.record("stream", self.model, time.perf_counter() - start, first_chunk,
+                            estimate_tokens(str(system_instruction) + str(messages)), len(words))
+
+
+# --- 4. SHARED CALLS ---
+class Flight:
+    """
+    One upstream stream in progress. Text is appended as it arrives; any number of
+    followers read it from the start, so a session that joins late still gets the whole reply.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def follow(self):
+        position = 0
+        while True:
+            with self.cond:
+                while position >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                new = self.chunks[position:]
+                position = len(self.chunks)
+                finished = self.done and position == len(self.chunks)
+            yield from new
+            if finished:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SharedBackend(LLMBackend):
+    """
+    Wraps a backend for the whole process. Identical requests that are in flight at the same
+    time (same model, system instruction and messages, e.g. many sessions asking a featured
+    dish's opening question) share one upstream stream, whose text is fanned out to each of them.
+    Every upstream call first waits its turn in a rate-limited queue.
+    """
+    def __init__(self, backend, queue):
+        self.backend = backend
+        self.name = backend.name
+        self.model = backend.model
+        self.metrics = backend.metrics
+        self.queue = queue
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {"flights": 0, "joined": 0}
+        self._background = BackgroundLane(self, TokenBucket(LLM_BACKGROUND_RATE, LLM_BACKGROUND_BURST))
+
+    def background(self):
+        """
+        The same backend for batch work; see BackgroundLane.
+        """
+        return self._background
+
+    def _admit(self, kind, priority=INTERACTIVE):
+        try:
+            if priority == INTERACTIVE:
+                waited = self.queue.acquire()
+            else:
+                waited = self.queue.acquire(priority, timeout=LLM_BACKGROUND_TIMEOUT)
+        except (QueueFullError, TimeoutError) as e:
+            raise QueueFullError(f"The AI Chef is busy right now, please try again in a moment. ({e})") from e
+        tracer.observe("chef_ai_llm_queue_wait_seconds", waited, kind=kind,
+                       lane="interactive" if priority == INTERACTIVE else "background")
+
+    def _request_key(self, messages, system_instruction, thinking_budget):
+        payload = repr((self.model, system_instruction, thinking_budget,
+                        [(m["role"], m["content"]) for m in messages]))
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _run(self, key, flight, messages, system_instruction, thinking_budget, priority):
+        try:
+            self._admit("stream", priority)
+            for text in self.backend.stream(messages, system_instruction, thinking_budget):
+                with flight.cond:
+                    flight.chunks.append(text)
+                    flight.cond.notify_all()
+        except Exception as e:
+            flight.error = e
+        finally:
+            # Requests arriving from now on start a new call
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+    def stream(self, messages, system_instruction=None, thinking_budget=None, priority=INTERACTIVE):
+        key = self._request_key(messages, system_instruction, thinking_budget)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight()
+                self._stats["flights"] += 1
+                threading.Thread(
+                    target=self._run, args=(key, flight, messages, system_instruction, thinking_budget, priority),
+                    daemon=True, name=f"llm-flight-{key[:8]}"
+                ).start()
+            else:
+                self._stats["joined"] += 1
+        return flight.follow()
+
+    def generate(self, messages, system_instruction=None, thinking_budget=None, priority=INTERACTIVE):
+        self._admit("generate", priority)
+        return self.backend.generate(messages, system_instruction, thinking_budget)
+
+    def stats(self):
+        with self._lock:
+            shared = dict(self._stats, in_flight=len(self._flights))
+        return dict(self.backend.stats(), shared=shared, queue=self.queue.stats())
+
+
+class BackgroundLane(LLMBackend):
+    """
+    The shared backend as batch work sees it: each call first takes a token from the lane's
+    own, slower bucket, then queues behind every interactive call, so a long import never
+    holds up a chat reply.
+    """
+    def __init__(self, shared, bucket):
+        self.shared = shared
+        self.name = shared.name
+        self.model = shared.model
+        self.metrics = shared.metrics
+        self.bucket = bucket
+
+    def stream(self, messages, system_instruction=None, thinking_budget=None):
+        self.bucket.acquire()
+        return self.shared.stream(messages, system_instruction, thinking_budget, priority=BACKGROUND)
+
+    def generate(self, messages, system_instruction=None, thinking_budget=None):
+        self.bucket.acquire()
+        return self.shared.generate(messages, system_instruction, thinking_budget, priority=BACKGROUND)
+
+    def stats(self):
+        return self.shared.stats()
+
+
+# --- 5. PUBLIC ENTRY POINT ---
+@st.cache_resource
+def get_llm_backend():
+    """
+    The process-wide LLM backend. Raises KeyError if Gemini is selected but no API key is configured.
+    """
+    model = get_model_name()
+    if LLM_BACKEND == "stub":
+        backend = StubBackend(model)
+    else:
+        backend = GeminiBackend(st.secrets.connections.geminiapi["GEMINI_API_KEY"], model)
+    queue = RequestQueue(TokenBucket(LLM_RATE, LLM_BURST), LLM_QUEUE_SIZE, LLM_QUEUE_TIMEOUT)
+    return SharedBackend(backend, queue)
@@ -1,7 +1,16 @@
+from tracing import begin_page, end_page, render_debug_panel
+
+# Timed from before the other imports, so the first visitor's wait includes loading them
+begin_page("main")
+
+import math
 import streamlit as st
-import duckdb
-from streamlit_gsheets import GSheetsConnection
-from chat_mode import render_ai_chat, inject_food_theme
+import recipe_db
+from autocomplete import build_title_index, AUTOCOMPLETE_LIMIT
+from menu_pages import current_page, page_buttons
+from recommend import similar_dishes, remember_view
+from theme_assets import inject_food_theme
+from session_store import render_session_report
 
 st.set_page_config(
     page_title="Best Thai Recipe",
@@ -11,20 +20,8 @@ st.set_page_config(
 # APPLY THEME
 inject_food_theme()
 
-@st.cache_resource
-def connect_datafood(name):
-    mycon = st.connection(name, type=GSheetsConnection)
-    return mycon
-@st.cache_data
-def load_datafood(_con):
-    df = _con.read(usecols=[1,2,3])
-    return df
-@st.cache_resource
-def connect_duckdb():
-    return duckdb.connect(database=':memory:')
-connect_googlesheet = connect_datafood("datafoods")
-CSV_FILE = load_datafood(connect_googlesheet)
-con = connect_duckdb()
+# Served from the local snapshot, which refreshes itself from the sheet in the background
+data_version = recipe_db.sync_recipes()
 
 st.write("# Best Thai recipe with any ingredients! 🥘") 
 st.sidebar.title("Recipe Book 📖")
@@ -48,14 +45,33 @@ st.markdown(
 
 st.divider()
 
-titles_query = f"""
-    SELECT "name(eng)" 
-    FROM CSV_FILE
-    WHERE "name(eng)" IS NOT NULL
-"""
+dish_query = st.sidebar.text_input(
+    "Find a dish by name (English or Thai)",
+    placeholder="e.g. pad thai, ผัดไทย"
+)
+search_query = st.sidebar.text_input(
+    "Search ingredients or method",
+    placeholder="e.g. lemongrass coconut milk"
+)
+
 try:
-    titles_result = con.execute(titles_query).fetchall()
-    titles_list = [row[0] for row in titles_result]
+    # The selectbox only gets a short list of names; the full catalogue stays on the server
+    title_index = build_title_index(data_version)
+    if dish_query.strip():
+        titles_list = title_index.complete(dish_query)
+        st.sidebar.caption(f"{len(titles_list)} closest dish names")
+    elif search_query.strip():
+        # Loaded (and its index built) only once someone searches
+        from recipe_search import search_recipes
+        titles_list = [name for name, _ in search_recipes(data_version, search_query)]
+        st.sidebar.caption(f"{len(titles_list)} matching dishes")
+    else:
+        # Browse the whole book a page at a time
+        page, page_df, has_next = current_page(data_version, key="sidebar_pages", page_size=AUTOCOMPLETE_LIMIT)
+        titles_list = page_df["Menu"].tolist()
+        if len(title_index) > AUTOCOMPLETE_LIMIT:
+            with st.sidebar:
+                page_buttons("sidebar_pages", page, has_next, math.ceil(len(title_index) / AUTOCOMPLETE_LIMIT))
 except Exception as e:
     st.error(f"Error reading database: {e}")
     titles_list = []
@@ -73,13 +89,40 @@ with st.sidebar:
 
 ##----Main----##
 
-if selected_dish:
-    detail_query = f"""
-        SELECT "name(eng)", "condiments", "howto"
-        FROM CSV_FILE
-        WHERE "name(eng)" = ?
+def show_recipe(version, dish_name, dish_instructions):
+    """
+    Recipe detail panel. It has no widgets of its own, so it is drawn on every full-page
+    rerun; sending a chat message reruns only the chat fragment and leaves it alone.
     """
-    result = con.execute(detail_query, [selected_dish]).fetchone()
+    st.header(dish_name)
+    thai_name = build_title_index(version).thai(dish_name)
+    if thai_name:
+        st.caption(thai_name)
+
+    st.subheader("🛒 Ingredients")
+    # Lines come pre-split from the parsed ingredient table
+    ingredient_rows = recipe_db.get_dish_ingredients(dish_name)
+    if ingredient_rows:
+        for _, _, _, line in ingredient_rows:
+            st.write(f"- {line}")
+    else:
+        st.info("No ingredients listed.")
+
+    st.subheader("👨‍🍳 How to make")
+    if dish_instructions and dish_instructions != "No instructions available.":
+        st.write(dish_instructions)
+    else:
+        st.info("No instructions available.")
+
+    similar = similar_dishes(version, dish_name)
+    if similar:
+        st.subheader("🍽️ Dishes like this")
+        st.caption("Dishes that share the most ingredients with this one.")
+        for name, score in similar:
+            st.write(f"- {name} ({score:.0%} match)")
+
+if selected_dish:
+    result = recipe_db.get_dish(selected_dish)
     
     dish_name = ""
     dish_ingredients = ""
@@ -90,22 +133,8 @@ if selected_dish:
         dish_ingredients = result[1] if result[1] else "No ingredients listed."
         dish_instructions = result[2] if result[2] else "No instructions available."
 
-        st.header(dish_name)
-
-        st.subheader("🛒 Ingredients")
-        if dish_ingredients and dish_ingredients != "No ingredients listed.":
-            for line in dish_ingredients.split('\n'):
-                line = line.strip()
-                if line:
-                    st.write(f"- {line}")
-        else:
-            st.info("No ingredients listed.")
-
-        st.subheader("👨‍🍳 How to make")
-        if dish_instructions and dish_instructions != "No instructions available.":
-            st.write(dish_instructions)
-        else:
-            st.info("No instructions available.")
+        show_recipe(data_version, dish_name, dish_instructions)
+        remember_view(dish_name)
 
 st.divider()
 
@@ -138,14 +167,21 @@ if st.session_state.chat_enabled:
 # -----------------------------------------------------------------------------
 
 if st.session_state.chat_enabled:
+    # The chat and its LLM modules are only loaded once chat is switched on
+    from chat_mode import render_ai_chat
+
     st.markdown("## Ask and extract a Youtube recipe!")
     col1, col2 = st.columns([1, 0.12])
     with col1:
         with st.container(border=True):
                 st.page_link(
-                    "pages/YouTube_Chef.py", 
+                    "pages/Youtube_Chef.py", 
                     label="**Click here to ask our AI Chef about substituting ingredients from a video!**", 
                     icon="🎥"
                 )
     
     render_ai_chat(st.session_state.recipe_data)
+
+end_page()
+render_debug_panel()
+render_session_report()
@@ -0,0 +1,88 @@
+import math
+import os
+
+import streamlit as st
+
+import recipe_db
+from recipe_db import PAGE_SORTS
+
+# --- 1. SETTINGS ---
+PAGE_SIZE = int(os.environ.get("CHEF_AI_PAGE_SIZE", 25))
+# Pages kept in memory across all sessions; each is at most PAGE_SIZE short rows
+PAGE_CACHE_ENTRIES = int(os.environ.get("CHEF_AI_PAGE_CACHE_ENTRIES", 512))
+
+
+# --- 2. PAGES ---
+@st.cache_data(max_entries=PAGE_CACHE_ENTRIES, show_spinner=False)
+def menu_page(version, category, sort, after, page_size=PAGE_SIZE):
+    """
+    One cached page per (dataset version, filter, sort, page). A page is named by the
+    cursor of the page before it, so the same page is never fetched twice.
+    """
+    return recipe_db.get_menu_page(category, sort, after, page_size)
+
+
+def _cursors(key, view):
+    """
+    Cursor of every page this session has reached for the current view, first page first.
+    Changing the filter, sort or dataset starts again at page 1.
+    """
+    state = st.session_state.get(key)
+    if state is None or state["view"] != view:
+        state = {"view": view, "afters": [None], "page": 0}
+        st.session_state[key] = state
+    return state
+
+
+def page_number(key, view):
+    """
+    This session's page (from 0) of a view paged by number rather than by cursor.
+    """
+    return _cursors(key, view)["page"]
+
+
+def _turn(key, step):
+    state = st.session_state[key]
+    state["page"] = max(state["page"] + step, 0)
+
+
+def _first(key):
+    st.session_state[key]["page"] = 0
+
+
+def current_page(version, category=None, sort="Sheet order", key="menu_pages", page_size=PAGE_SIZE):
+    """
+    Returns (page number from 0, page dataframe, whether there is a next page) for this
+    session's place in the given view.
+    """
+    state = _cursors(key, (version, category, sort, page_size))
+    page = state["page"]
+    df, next_after = menu_page(version, category, sort, state["afters"][page], page_size)
+    if next_after is not None and len(state["afters"]) == page + 1:
+        state["afters"].append(next_after)
+    return page, df, next_after is not None
+
+
+def page_buttons(key, page, has_next, pages=None):
+    """
+    First / previous / next buttons and a "Page x of y" caption, in the current container.
+    """
+    col_first, col_prev, col_next = st.columns(3)
+    col_first.button("⏮ First", key=f"{key}_first", disabled=page == 0, on_click=_first, args=(key,))
+    col_prev.button("◀ Previous", key=f"{key}_prev", disabled=page == 0, on_click=_turn, args=(key, -1))
+    col_next.button("Next ▶", key=f"{key}_next", disabled=not has_next, on_click=_turn, args=(key, 1))
+    st.caption(f"Page {page + 1} of {pages}" if pages else f"Page {page + 1}")
+
+
+def paged_menu(version, category=None, key="menu_pages"):
+    """
+    Sortable menu table showing one page at a time; the browser only receives that page.
+    """
+    sort = st.selectbox("Sort by", list(PAGE_SORTS), key=f"{key}_sort")
+    page, df, has_next = current_page(version, category, sort, key)
+    total = recipe_db.category_counts(version)[category] if category else recipe_db.count_recipes()
+    # Number the rows across pages, starting from 1
+    df = df.drop(columns="id")
+    df.index = range(page * PAGE_SIZE + 1, page * PAGE_SIZE + len(df) + 1)
+    st.dataframe(df, use_container_width=True)
+    page_buttons(key, page, has_next, max(math.ceil(total / PAGE_SIZE), 1))
@@ -1,8 +1,19 @@
+from tracing import begin_page, end_page, render_debug_panel
+
+# Timed from before the other imports, so the first visitor's wait includes loading them
+begin_page("for_you")
+
+import json
+import math
 import streamlit as st
-import duckdb
-from streamlit_gsheets import GSheetsConnection
+import recipe_db
 import plotly.graph_objects as go
-from chat_mode import render_ai_chat, inject_food_theme
+from theme_assets import inject_food_theme
+from recommend import similar_dishes, recommend_for_session, remember_view
+from pantry import parse_pantry, rank_dishes, pantry_notes
+from autocomplete import dish_picker
+from menu_pages import paged_menu, page_buttons, page_number, PAGE_SIZE
+from session_store import render_session_report
 
 st.set_page_config(page_title="Menu Analyzer", page_icon="📊")
 
@@ -16,23 +27,8 @@ with col1:
 st.divider()
 
 # --- 1. SETUP DATABASE CONNECTION ---
-@st.cache_resource
-def connect_datafood(name):
-    mycon = st.connection(name, type=GSheetsConnection)
-    return mycon
-
-@st.cache_data
-def load_datafood(_con):
-    df = _con.read(usecols=[1,2,3,4,5,6,7,8,9])
-    return df
-
-@st.cache_resource
-def connect_duckdb():
-    return duckdb.connect(database=':memory:')
-
-connect_googlesheet = connect_datafood("datafoods")
-CSV_FILE = load_datafood(connect_googlesheet)
-con = connect_duckdb()
+# Served from the local snapshot, which refreshes itself from the sheet in the background
+data_version = recipe_db.sync_recipes()
 
 st.title("📊 Ingredient Analyzer")
 
@@ -46,105 +42,193 @@ show_chat_section = st.sidebar.toggle("Enable AI Chat Assistant", value=False)
 # ==============================================================================
 st.subheader("1. Ingredient Distribution")
 
-categories = ['Pork', 'Beef', 'Prawn', 'Chicken', 'Fish','Other']
-counts = []
+BAR_COLORS = ['#E74C3C', '#C0392B', '#E67E22', '#F39C12', '#F5B041', '#D35400']
 
-for cat in categories:
-    query = f"""
-        SELECT count(*) FROM CSV_FILE 
-        WHERE "{cat}" = 1;
+@st.cache_data
+def build_category_figure(version, dark_mode):
     """
-    
-    result = con.execute(query).fetchone()
-    counts.append(result[0] if result else 0)
+    Builds the bar chart once per (dataset version, theme) and keeps it as JSON,
+    so clicks and theme toggles redraw without touching the database.
+    """
+    counts = recipe_db.category_counts(version)
+    categories = list(counts)
+
+    # Updated chart colors for theme
+    fig = go.Figure(data=[go.Bar(
+        x=categories,
+        y=list(counts.values()),
+        marker_color=[BAR_COLORS[i % len(BAR_COLORS)] for i in range(len(categories))]
+    )])
+
+    # Chart styling based on theme
+    text_col = "#E0E0E0" if dark_mode else "#2C3E50"
+
+    fig.update_layout(
+        title="Recipe Count by Main Ingredient",
+        xaxis_title="Ingredient",
+        yaxis_title="Number of Recipes",
+        clickmode='event+select',
+        font=dict(family="Lato, sans-serif", color=text_col),
+        title_font=dict(family="Merriweather, serif", color="#E67E22"),
+        paper_bgcolor='rgba(0,0,0,0)', # Transparent background
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig.to_json()
 
-# Updated chart colors for theme
-fig = go.Figure(data=[go.Bar(
-    x=categories,
-    y=counts,
-    marker_color=['#E74C3C', '#C0392B', '#E67E22', '#F39C12', '#F5B041', '#D35400'] 
-)])
+@st.fragment
+def show_category_panel(version, dark_mode):
+    """
+    Chart and filtered table. A bar click reruns only this panel.
+    """
+    fig = go.Figure(json.loads(build_category_figure(version, dark_mode)))
+
+    selected_point = st.plotly_chart(fig, use_container_width=True, on_select="rerun", key="category_chart")
+
+
+    # ==============================================================================
+    # CONTENT SECTION 2: Query Table
+    # ==============================================================================
+    st.subheader("2. Filtered Recipe List")
+
+    selected_category = None
 
-# Chart styling based on theme
-text_col = "#E0E0E0" if st.session_state.get('dark_mode', False) else "#2C3E50"
+    if selected_point and selected_point['selection']['points']:
+        selected_category = selected_point['selection']['points'][0]['x']
 
-fig.update_layout(
-    title="Recipe Count by Main Ingredient",
-    xaxis_title="Ingredient",
-    yaxis_title="Number of Recipes",
-    clickmode='event+select',
-    font=dict(family="Lato, sans-serif", color=text_col),
-    title_font=dict(family="Merriweather, serif", color="#E67E22"),
-    paper_bgcolor='rgba(0,0,0,0)', # Transparent background
-    plot_bgcolor='rgba(0,0,0,0)'
-)
+    if selected_category:
+        st.info(f"Showing recipes containing: **{selected_category.capitalize()}**")
+    else:
+        st.write("Displaying all recipes containing the analyzed ingredients (Click a bar above to filter).")
+
+    try:
+        # Only the visible page is fetched and sent, numbered from 1 across pages
+        paged_menu(version, selected_category, key="category_pages")
 
-selected_point = st.plotly_chart(fig, use_container_width=True, on_select="rerun")
+    except Exception as e:
+        st.error(f"Error fetching data: {e}")
+
+show_category_panel(data_version, st.session_state.get('dark_mode', False))
 
 
 # ==============================================================================
-# CONTENT SECTION 2: Query Table
+# CONTENT SECTION 3: Recommendations
 # ==============================================================================
-st.subheader("2. Filtered Recipe List")
+st.subheader("3. Recommended For You")
+
+@st.fragment
+def show_recommendations(version):
+    """
+    Suggestions from the ingredient-similarity table; picking a dish reruns only this panel.
+    """
+    suggestions = recommend_for_session(version)
+    if suggestions:
+        st.write("Based on the dishes you viewed:")
+        st.dataframe(
+            [{"Menu": name, "Match": f"{score:.2f}"} for name, score in suggestions],
+            use_container_width=True
+        )
+    else:
+        st.write("Open a few recipes in the Recipe Book and dishes you may like will appear here.")
+
+    liked_dish = dish_picker(version, "Find dishes like:", key="liked_dish")
+    if liked_dish:
+        remember_view(liked_dish)
+        similar = similar_dishes(version, liked_dish, limit=10)
+        if similar:
+            st.dataframe(
+                [{"Menu": name, "Similarity": f"{score:.0%}"} for name, score in similar],
+                use_container_width=True
+            )
+        else:
+            st.info("No dish shares ingredients with this one yet.")
+
+show_recommendations(data_version)
 
-selected_category = None
 
-if selected_point and selected_point['selection']['points']:
-    selected_category = selected_point['selection']['points'][0]['x']
+# ==============================================================================
+# CONTENT SECTION 4: Pantry Match
+# ==============================================================================
+st.subheader("4. Cook With What You Have")
 
-if selected_category:
-    st.info(f"Showing recipes containing: **{selected_category.capitalize()}**")
-    table_query = f"""
-        SELECT "name(eng)" AS Menu
-        FROM CSV_FILE 
-        WHERE "{selected_category}" = 1;
+@st.fragment
+def show_pantry_matches(version):
     """
-else:
-    st.write("Displaying all recipes containing the analyzed ingredients (Click a bar above to filter).")
-    table_query = """
-        SELECT "name(eng)" AS Menu
-        FROM CSV_FILE  
+    Ranks every dish by how much of it the pantry covers, one page of matches at a time.
+    Typing reruns only this panel; asking the AI Chef about a match reruns the page so the
+    chat opens with it.
     """
+    pantry_text = st.text_area(
+        "What's in your kitchen? (comma or one per line)",
+        placeholder="garlic, fish sauce, chicken, jasmine rice, brown sugar",
+        key="pantry_text"
+    )
+    pantry = parse_pantry(pantry_text)
+    if not pantry:
+        st.write("List the ingredients you have and the dishes you can cook will appear here.")
+        return
+
+    # A different pantry starts again at page 1
+    page = page_number("pantry_pages", (version, tuple(pantry)))
+    matches, total = rank_dishes(version, pantry, page * PAGE_SIZE, PAGE_SIZE)
+    if not total:
+        st.info("None of the recipes use these ingredients yet.")
+        return
+
+    st.dataframe(
+        [{
+            "Menu": m["name"],
+            "Coverage": f"{m['coverage']:.0%}",
+            "Have": f"{m['have']}/{m['total']}",
+            "Substitutes": ", ".join(f"{sub} for {item}" for item, sub in m["substitutions"].items()),
+            "Missing": ", ".join(m["missing_items"]),
+        } for m in matches],
+        use_container_width=True
+    )
+    page_buttons("pantry_pages", page, (page + 1) * PAGE_SIZE < total, math.ceil(total / PAGE_SIZE))
+
+    picked = st.selectbox("Cook one of these:", options=[m["name"] for m in matches], key="pantry_pick")
+    if st.button("Ask the AI Chef 🤖", key="pantry_ask"):
+        match = next(m for m in matches if m["name"] == picked)
+        res = recipe_db.get_dish(picked)
+        st.session_state.pantry_chat_dish = {
+            "name": res[0] if res else picked,
+            "ingredients": res[1] if res else "",
+            "instructions": res[2] if res else "",
+            "notes": pantry_notes(match)
+        }
+        remember_view(picked)
+        st.rerun()
 
-try:
-    df_result = con.execute(table_query).fetchdf()
-    
-    # --- FIX: START INDEX FROM 1 ---
-    # Pandas defaults to 0, so we just add 1 to the whole index
-    df_result.index = df_result.index + 1 
-    
-    # Display with width="stretch" (fixing the warning you saw earlier)
-    st.dataframe(df_result, use_container_width=True)
-    
-except Exception as e:
-    st.error(f"Error fetching data: {e}")
+show_pantry_matches(data_version)
 
 
 # ==============================================================================
-# CONTENT SECTION 3: Chat Interface (Conditional)
+# CONTENT SECTION 5: Chat Interface (Conditional)
 # ==============================================================================
 
-if show_chat_section:
+@st.fragment
+def show_dish_chat(version):
+    """
+    Dish picker plus chat. Picking a dish reruns only this section; the chat inside
+    is its own fragment, so sending a message reruns only the chat.
+    """
     st.divider()
+
+    pantry_dish = st.session_state.get("pantry_chat_dish")
+    if pantry_dish:
+        st.caption(f"Cooking **{pantry_dish['name']}** from your pantry. {pantry_dish['notes']}")
+        if st.button("Choose another dish", key="pantry_chat_clear"):
+            del st.session_state.pantry_chat_dish
+            st.rerun()
+        render_ai_chat(pantry_dish)
+        return
     
-    titles_query = 'SELECT "name(eng)" FROM CSV_FILE WHERE "name(eng)" IS NOT NULL'
-    try:
-        titles_result = con.execute(titles_query).fetchall()
-        titles_list = [row[0] for row in titles_result]
-    except:
-        titles_list = []
-
-    selected_dish_menu = st.selectbox(
-        "Select a dish to discuss:",
-        options=titles_list,
-        index=None,
-        placeholder="Choose a recipe..."
-    )
+    selected_dish_menu = dish_picker(version, "Select a dish to discuss:", key="chat_dish")
 
     if selected_dish_menu:
+        remember_view(selected_dish_menu)
         # Reuse logic
-        detail_query = 'SELECT "name(eng)", "condiments", "howto" FROM CSV_FILE WHERE "name(eng)" = ?'
-        res = con.execute(detail_query, [selected_dish_menu]).fetchone()
+        res = recipe_db.get_dish(selected_dish_menu)
         
         dish_data_for_chat = {
             "name": res[0] if res else "",
@@ -157,3 +241,11 @@ if show_chat_section:
     else:
         st.info("Please select a dish above to start the chat.")
 
+if show_chat_section or st.session_state.get("pantry_chat_dish"):
+    # The chat and its LLM modules are only loaded once the chat is opened
+    from chat_mode import render_ai_chat
+    show_dish_chat(data_version)
+
+end_page()
+render_debug_panel()
+render_session_report()
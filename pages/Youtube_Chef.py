@@ -1,9 +1,15 @@
+from tracing import begin_page, end_page, render_debug_panel
+
+# Timed from before the other imports, so the first visitor's wait includes loading them
+begin_page("youtube")
+
 import streamlit as st
-from google import genai
-from google.genai import types
-from youtube_transcript_api import YouTubeTranscriptApi
-from urllib.parse import urlparse, parse_qs
-from chat_mode import inject_food_theme
+import hashlib
+import recipe_db
+from theme_assets import inject_food_theme
+from session_store import load_chat, chat_offset, append_message, reset_chat, load_text, save_text, render_session_report
+# The LLM, extraction and import modules are imported by the sections that use them,
+# so a visit that only reads the extracted recipe does not load them
 
 st.set_page_config(page_title="YouTube AI Chef", page_icon="🎥")
 
@@ -32,85 +38,149 @@ st.markdown(
 )
 
 # --- 1. SETUP & SESSION STATE ---
-if "current_video_recipe" not in st.session_state:
-    st.session_state.current_video_recipe = None 
-
-if "youtube_chat_history" not in st.session_state:
-    st.session_state.youtube_chat_history = []
-
-def get_video_id(url):
-    query = urlparse(url)
-    if query.hostname == 'youtu.be':
-        return query.path[1:]
-    if query.hostname in ('www.youtube.com', 'youtube.com'):
-        if query.path == '/watch':
-            p = parse_qs(query.query)
-            return p['v'][0]
-    return None
+# The extracted recipe and its chat are kept in the server-side session store (session_store.py)
+TRANSCRIPT_LANGUAGES = ['th', 'en']
 
 # --- 2. INPUT SECTION ---
 video_url = st.text_input("Paste YouTube Link here:", placeholder="https://www.youtube.com/watch?v=...")
 
 # --- 3. PROCESS VIDEO (The Extraction Phase) ---
+# Extraction runs as a background job on a shared worker pool; this session only keeps the job ID
+if "youtube_job_id" not in st.session_state:
+    st.session_state.youtube_job_id = None
+
 if st.button("Extract Recipe 👨‍🍳") and video_url:
+    from video_ingest import get_video_id
     video_id = get_video_id(video_url)
     
     if not video_id:
         st.error("Invalid YouTube URL. Please try again.")
     else:
-        with st.spinner("Watching video and taking notes..."):
+        from llm_backend import get_llm_backend
+        from video_cache import get_video_cache
+        from video_jobs import get_extraction_queue
+        try:
+            llm = get_llm_backend()
+        except (AttributeError, KeyError):
+            llm = None
+
+        if llm:
+            extraction_queue = get_extraction_queue(llm, get_video_cache())
+            st.session_state.youtube_job_id = extraction_queue.submit(video_id, TRANSCRIPT_LANGUAGES)
+        else:
+            st.error("API Key missing in secrets.toml")
+
+@st.fragment(run_every=1)
+def show_extraction_progress():
+    """
+    Polls the background job once a second; only this fragment reruns while waiting.
+    """
+    from chat_history import reset_history
+    from llm_backend import get_llm_backend
+    from video_cache import get_video_cache
+    from video_extract import recipe_markdown
+    from video_jobs import get_extraction_queue
+    extraction_queue = get_extraction_queue(get_llm_backend(), get_video_cache())
+    job = extraction_queue.get(st.session_state.youtube_job_id)
+
+    if job is None or job["status"] == "error":
+        error = job["error"] if job else "the job was lost"
+        st.error(f"Could not process video. (Note: This only works on videos with captions). Error: {error}")
+        st.session_state.youtube_job_id = None
+        return
+
+    if job["status"] == "done":
+        save_text("current_video_recipe", recipe_markdown(job["recipe"]))
+        reset_chat("youtube_chat_history", [
+            {"role": "model", "content": "I've analyzed the video! Ask me anything about this recipe."}
+        ])
+        reset_history("youtube_history_window")
+        st.session_state.youtube_job_id = None
+        st.rerun()
+
+    fraction = job["done_chunks"] / job["total_chunks"] if job["total_chunks"] else 0.0
+    st.progress(fraction, text=job["message"])
+    if job["recipe"]:
+        st.markdown(recipe_markdown(job["recipe"]))
+
+if st.session_state.youtube_job_id:
+    show_extraction_progress()
+
+# --- 3b. BATCH IMPORT INTO THE RECIPE BOOK ---
+if "youtube_ingest_id" not in st.session_state:
+    st.session_state.youtube_ingest_id = None
+
+with st.expander("📚 Import many videos into the Recipe Book"):
+    st.caption("Paste video links or a playlist link, one per line. Videos imported before are skipped, so an interrupted import can simply be started again.")
+    batch_text = st.text_area("Video or playlist links:", height=150)
+
+    if st.button("Import Recipes 📥", disabled=bool(st.session_state.youtube_ingest_id)) and batch_text.strip():
+        from llm_backend import get_llm_backend
+        from video_cache import get_video_cache
+        from video_ingest import parse_video_list, start_ingest
+        try:
+            video_ids, invalid_links = parse_video_list(batch_text)
+        except Exception as e:
+            video_ids, invalid_links = [], []
+            st.error(f"Could not read the playlist. Error: {e}")
+        if invalid_links:
+            st.warning(f"Skipped {len(invalid_links)} link(s) that are not YouTube videos: {', '.join(invalid_links[:5])}")
+        if video_ids:
             try:
-                transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['th', 'en'])
-                full_text = " ".join([t['text'] for t in transcript_list])
-                
-                if "geminiapi" in st.secrets.connections:
-                    api_key = st.secrets.connections.geminiapi["GEMINI_API_KEY"]
-                    client = genai.Client(api_key=api_key)
-                    
-                    sys_instruct = (
-                        "Role: You are an expert Chef. "
-                        "Task: Read the following video transcript and extract the recipe. "
-                        "Output Format: Please provide a clear title, then a list of Ingredients, then Instructions."
-                    )
-                    
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        contents=f"Here is the video transcript: {full_text}",
-                        config=types.GenerateContentConfig(
-                            system_instruction=sys_instruct
-                        ),
-                    )
-                    
-                    st.session_state.current_video_recipe = response.text
-                    
-                    st.session_state.youtube_chat_history = [
-                        {"role": "model", "content": "I've analyzed the video! Ask me anything about this recipe."}
-                    ]
-                    
-                else:
-                    st.error("API Key missing in secrets.toml")
-
-            except Exception as e:
-                st.error(f"Could not process video. (Note: This only works on videos with captions). Error: {e}")
+                llm = get_llm_backend()
+            except (AttributeError, KeyError):
+                llm = None
+            if llm:
+                st.session_state.youtube_ingest_id = start_ingest(video_ids, llm, get_video_cache(), TRANSCRIPT_LANGUAGES)
+            else:
+                st.error("API Key missing in secrets.toml")
+
+    @st.fragment(run_every=2)
+    def show_ingest_progress():
+        from video_ingest import get_ingest_progress
+        progress = get_ingest_progress(st.session_state.youtube_ingest_id)
+        if progress is None:
+            st.session_state.youtube_ingest_id = None
+            return
+        finished = progress["skipped"] + progress["done"] + progress["failed"]
+        st.progress(finished / progress["total"] if progress["total"] else 1.0,
+                    text=f"{finished} of {progress['total']} videos ({progress['done']} imported, "
+                         f"{progress['skipped']} already in the book, {progress['failed']} failed)")
+        for error in progress["errors"][-5:]:
+            st.caption(f"⚠️ {error}")
+        # Make the new dishes visible on every page as soon as each batch is written
+        recipe_db.sync_recipes()
+        if not progress["running"]:
+            st.success("Import finished. The new dishes are in the Recipe Book.")
+            st.session_state.youtube_ingest_id = None
+
+    if st.session_state.youtube_ingest_id:
+        show_ingest_progress()
 
 # --- 4. DISPLAY RESULTS & CHATBOT ---
-if st.session_state.current_video_recipe:
-    
+def show_video_chat(current_video_recipe):
+    """
+    The extracted recipe and the chat about it. The chat modules are only loaded here.
+    """
+    from chat_cache import get_answer_cache, replay_answer
+    from chat_history import window_history, with_summary
+    from llm_backend import get_llm_backend, estimate_tokens
+
     st.divider()
     st.subheader("🍲 The Extracted Recipe")
-    st.markdown(st.session_state.current_video_recipe)
-    
+    st.markdown(current_video_recipe)
+
     st.divider()
     st.header("Ask our AI Chef! 🤖")
     st.markdown("Ask for substitutions, tips, or clarification about the video you just watched.")
 
     # --- CHATBOT LOGIC ---
     try:
-        gemini_client = genai.Client(api_key=st.secrets.connections.geminiapi["GEMINI_API_KEY"])
+        llm = get_llm_backend()
     except Exception:
-        st.stop()
+        return
 
-    recipe_context = st.session_state.current_video_recipe
+    recipe_context = current_video_recipe
     system_instruction = (
         "Role: You are an expert Thai chef. "
         "Context: The user is asking about a specific recipe derived from a YouTube video. "
@@ -119,39 +189,56 @@ if st.session_state.current_video_recipe:
         "Be polite and helpful."
     )
 
-    for message in st.session_state.youtube_chat_history:
+    youtube_chat_history = load_chat("youtube_chat_history")
+    for message in youtube_chat_history:
         with st.chat_message(message['role']):
             st.markdown(message['content'])
 
     if prompt := st.chat_input('Ask about this video recipe...'):
-        
-        st.session_state.youtube_chat_history.append({'role':'user','content':prompt})
+    
+        append_message("youtube_chat_history", 'user', prompt)
+        # Re-read, since storing the message may have trimmed the oldest ones to stay under the cap
+        youtube_chat_history = load_chat("youtube_chat_history")
+        offset = chat_offset("youtube_chat_history")
         with st.chat_message('user'):
             st.write(prompt)
-            
+        
         with st.chat_message('model'):
-            gemini_history = []
-            for message in st.session_state.youtube_chat_history:
-                role = "user" if message["role"] == "user" else "model"
-                gemini_history.append(types.Content(role=role, parts=[types.Part(text=message["content"])]))
+            # Answers to the opening question about the same extracted recipe are shared
+            answer_cache = get_answer_cache()
+            recipe_key = "youtube:" + hashlib.sha1(recipe_context.encode()).hexdigest()[:16]
+            is_opening_question = offset == 0 and sum(1 for m in youtube_chat_history if m['role'] == 'user') == 1
+            cached_answer = answer_cache.get(recipe_key, prompt, llm.model) if is_opening_question else None
+            if cached_answer:
+                st.write_stream(replay_answer(cached_answer))
+                append_message("youtube_chat_history", 'model', cached_answer)
+                return
 
             try:
-                response_stream = gemini_client.models.generate_content_stream(
-                    model="gemini-2.5-flash", 
-                    contents=gemini_history,
-                    config=types.GenerateContentConfig(
-                        system_instruction=system_instruction
-                    )
+                # Only recent turns go out verbatim; older ones travel as a running summary
+                history, summary, prompt_tokens = window_history(
+                    youtube_chat_history, llm, "youtube_history_window", offset=offset
+                )
+                response_stream = llm.stream(
+                    history,
+                    system_instruction=with_summary(system_instruction, summary)
                 )
-                
-                def stream_parser(stream):
-                    for chunk in stream:
-                        if chunk.text:
-                            yield chunk.text
 
-                response_content = st.write_stream(stream_parser(response_stream))
-                    
-                st.session_state.youtube_chat_history.append({'role':'model','content':response_content})
+                response_content = st.write_stream(response_stream)
+                
+                append_message("youtube_chat_history", 'model', response_content)
+                st.caption(f"Prompt size: ~{prompt_tokens + estimate_tokens(system_instruction)} tokens")
+                if is_opening_question:
+                    answer_cache.put(recipe_key, prompt, llm.model, response_content)
 
             except Exception as e:
                 st.error(f"Chatbot Error: {e}")
+
+
+current_video_recipe = load_text("current_video_recipe")
+if current_video_recipe:
+    show_video_chat(current_video_recipe)
+
+end_page()
+render_debug_panel()
+render_session_report()
@@ -0,0 +1,137 @@
+import re
+
+import numpy as np
+import streamlit as st
+
+import recipe_db
+from ingredients import canonical_ingredient, SUBSTITUTES
+
+# --- 1. SETTINGS ---
+# A missing ingredient with a known substitute in the pantry counts as half an ingredient you have
+SUBSTITUTE_WEIGHT = 0.5
+WORD_BITS = 64
+
+# Bits set per byte, for NumPy versions without bitwise_count
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """
+    Number of set bits in each row of a uint64 bitset array.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    # Viewing the words as bytes needs the rows to be contiguous
+    return _BYTE_POPCOUNT[np.ascontiguousarray(words).view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def parse_pantry(text):
+    """
+    Canonical ingredient names from a comma- or line-separated pantry list.
+    """
+    items = [canonical_ingredient(item) for item in re.split(r"[,\n;]+", text)]
+    return list(dict.fromkeys(item for item in items if item))
+
+
+# --- 2. BITSET INDEX ---
+class PantryIndex:
+    """
+    Every dish as a bitset over the ingredient vocabulary (one bit per canonical ingredient),
+    so the whole catalogue is scored against a pantry with a few array-wide AND/popcount passes.
+    """
+    def __init__(self, names, recipe_ids, ingredients):
+        self.names = list(names)
+        self.vocabulary, term_ids = np.unique(ingredients.astype(str), return_inverse=True)
+        self.term_ids = {term: i for i, term in enumerate(self.vocabulary)}
+        self.words = max(1, -(-len(self.vocabulary) // WORD_BITS))
+        self.bits = np.zeros((len(self.names), self.words), dtype=np.uint64)
+        masks = np.left_shift(np.uint64(1), (term_ids % WORD_BITS).astype(np.uint64))
+        np.bitwise_or.at(self.bits, (recipe_ids - 1, term_ids // WORD_BITS), masks)
+        self.sizes = popcount(self.bits)
+
+    def encode(self, items):
+        bitset = np.zeros(self.words, dtype=np.uint64)
+        for item in items:
+            term_id = self.term_ids.get(item)
+            if term_id is not None:
+                bitset[term_id // WORD_BITS] |= np.uint64(1) << np.uint64(term_id % WORD_BITS)
+        return bitset
+
+    def decode(self, bitset):
+        positions = np.flatnonzero(np.unpackbits(bitset.view(np.uint8), bitorder="little"))
+        return [str(self.vocabulary[p]) for p in positions if p < len(self.vocabulary)]
+
+    def substitutions(self, pantry):
+        """
+        {missing ingredient: pantry item that can stand in for it}, for every ingredient with a known substitute.
+        """
+        available = set(pantry)
+        found = {}
+        for ingredient, options in SUBSTITUTES.items():
+            for option in options:
+                if option in available:
+                    found[ingredient] = option
+                    break
+        return found
+
+    def rank(self, pantry, start=0, count=None):
+        """
+        Ranks every dish that uses something from the pantry by how much of the recipe the
+        pantry covers, counting substitutable ingredients at SUBSTITUTE_WEIGHT. Returns
+        (one dict per dish for ranks start to start + count, best first; number of dishes ranked).
+        """
+        have_bits = self.encode(pantry)
+        substitutions = self.substitutions(pantry)
+        sub_bits = self.encode(substitutions) & ~have_bits
+
+        # Only the words where the pantry has any bit set can add to a count
+        columns = np.flatnonzero(have_bits | sub_bits)
+        dish_bits = self.bits[:, columns]
+        have = popcount(dish_bits & have_bits[columns])
+        substitutable = popcount(dish_bits & sub_bits[columns])
+        missing = self.sizes - have - substitutable
+        coverage = (have + SUBSTITUTE_WEIGHT * substitutable) / np.maximum(self.sizes, 1)
+
+        candidates = np.flatnonzero((have + substitutable) > 0)
+        # Best coverage first, then fewest missing items, then the dish order of the sheet
+        order = np.lexsort((candidates, missing[candidates], -coverage[candidates]))
+        ranked = candidates[order]
+        # Only the requested ranks are spelled out as ingredient lists
+        stop = len(ranked) if count is None else start + count
+        results = []
+        for i in ranked[start:stop]:
+            missing_items = self.decode(self.bits[i] & ~have_bits & ~sub_bits)
+            swaps = {item: substitutions[item] for item in self.decode(self.bits[i] & sub_bits)}
+            results.append({
+                "name": self.names[i], "coverage": float(coverage[i]), "have": int(have[i]),
+                "substitutable": int(substitutable[i]), "missing": int(missing[i]), "total": int(self.sizes[i]),
+                "missing_items": missing_items, "substitutions": swaps,
+            })
+        return results, len(ranked)
+
+
+@st.cache_resource(max_entries=2)
+def build_pantry_index(version):
+    """
+    Builds the bitsets once per dataset version.
+    """
+    recipe_ids, ingredients = recipe_db.get_recipe_ingredients()
+    return PantryIndex(recipe_db.get_titles(), recipe_ids, ingredients)
+
+
+def rank_dishes(version, pantry, start=0, count=None):
+    return build_pantry_index(version).rank(pantry, start, count)
+
+
+def pantry_notes(match):
+    """
+    One line for the AI Chef about what the cook has to work around.
+    """
+    notes = []
+    if match["substitutions"]:
+        notes.append("they will replace " + ", ".join(f"{item} with {sub}" for item, sub in match["substitutions"].items()))
+    if match["missing_items"]:
+        notes.append("they do not have " + ", ".join(match["missing_items"]))
+    if not notes:
+        return "The cook has every ingredient."
+    return "The cook is cooking from their pantry: " + "; ".join(notes) + "."
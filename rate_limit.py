@@ -0,0 +1,130 @@
+import heapq
+import threading
+import time
+
+# Queue priorities: lower is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `burst`.
+    acquire() blocks until a token is free, so bursts turn into short waits.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1.0):
+        """
+        Takes tokens if available and returns 0.0, otherwise returns the seconds to wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def acquire(self, tokens=1.0, timeout=None):
+        """
+        Waits for tokens; returns the time spent waiting, or raises TimeoutError.
+        """
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return time.monotonic() - start
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                raise TimeoutError(f"Rate limit: no capacity within {timeout}s")
+            time.sleep(min(wait, 1.0))
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class RequestQueue:
+    """
+    Priority line in front of a TokenBucket. Callers wait their turn and then for a token,
+    so a burst becomes a short queue. Interactive callers are always served before background
+    ones, first come first served within each priority. Once `max_waiting` callers of the same
+    or higher priority are already waiting, new ones are turned away at once with
+    QueueFullError (backpressure); background callers never count against interactive ones.
+    """
+    def __init__(self, bucket, max_waiting, timeout=None):
+        self.bucket = bucket
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._line = []
+        self._arrivals = 0
+        self._busy = False
+        self._stats = {"admitted": 0, "rejected": 0, "timed_out": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+    def _waiting(self, priority=BACKGROUND):
+        return sum(1 for p, _ in self._line if p <= priority)
+
+    def _leave(self, entry):
+        self._line.remove(entry)
+        heapq.heapify(self._line)
+        self._cond.notify_all()
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        """
+        Waits for this caller's turn and a token; returns the seconds waited. `timeout` defaults
+        to the queue's. Raises QueueFullError if the line is full, TimeoutError if the wait exceeds the timeout.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        with self._cond:
+            if self._waiting(priority) >= self.max_waiting:
+                self._stats["rejected"] += 1
+                raise QueueFullError(f"{self.max_waiting} requests are already waiting")
+            entry = (priority, self._arrivals)
+            self._arrivals += 1
+            heapq.heappush(self._line, entry)
+            while self._busy or self._line[0] != entry:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    self._leave(entry)
+                    self._stats["timed_out"] += 1
+                    raise TimeoutError(f"Rate limit: not served within {timeout}s")
+                self._cond.wait(remaining)
+            heapq.heappop(self._line)
+            self._busy = True
+        try:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            self.bucket.acquire(timeout=remaining)
+        except TimeoutError:
+            with self._cond:
+                self._stats["timed_out"] += 1
+            raise
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats["admitted"] += 1
+            self._stats["wait_total"] += waited
+            self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+        return waited
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["waiting"] = self._waiting()
+            stats["waiting_interactive"] = self._waiting(INTERACTIVE)
+        stats["wait_avg"] = stats["wait_total"] / stats["admitted"] if stats["admitted"] else 0.0
+        return stats
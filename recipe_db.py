@@ -0,0 +1,394 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import duckdb
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from recipe_store import load_datafood, CATEGORIES
+from ingredients import load_ingredient_table
+from tracing import span, tracer
+
+# --- 1. SCHEMA ---
+# One real table for every page, loaded from the snapshot once per dataset version.
+FLAG_COLUMNS = ", ".join(f'"{cat}" TINYINT NOT NULL DEFAULT 0' for cat in CATEGORIES)
+CREATE_RECIPES = f"""
+    CREATE TABLE IF NOT EXISTS recipes (
+        id INTEGER PRIMARY KEY,
+        "name(eng)" VARCHAR NOT NULL,
+        "name(th)" VARCHAR,
+        "condiments" VARCHAR,
+        "howto" VARCHAR,
+        {FLAG_COLUMNS},
+        "source" VARCHAR NOT NULL DEFAULT 'sheet',
+        ingredient_count INTEGER NOT NULL DEFAULT 0
+    )
+"""
+CREATE_STATS = """
+    CREATE TABLE IF NOT EXISTS category_stats (
+        category VARCHAR PRIMARY KEY,
+        recipes INTEGER NOT NULL
+    )
+"""
+CREATE_INGREDIENTS = """
+    CREATE TABLE IF NOT EXISTS ingredients (
+        recipe_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        quantity DOUBLE,
+        unit VARCHAR,
+        ingredient VARCHAR NOT NULL,
+        line VARCHAR NOT NULL
+    )
+"""
+CREATE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_recipes_name ON recipes("name(eng)")',
+    'CREATE INDEX IF NOT EXISTS idx_ingredients_name ON ingredients(ingredient)',
+    'CREATE INDEX IF NOT EXISTS idx_ingredients_recipe ON ingredients(recipe_id)',
+    'CREATE INDEX IF NOT EXISTS idx_recipes_source ON recipes("source")',
+] + [
+    f'CREATE INDEX IF NOT EXISTS idx_recipes_{cat.lower()} ON recipes("{cat}")' for cat in CATEGORIES
+]
+
+# --- 2. QUERIES ---
+# Fixed SQL with bound parameters. Column names cannot be bound, so the category
+# filters are built once from the known category list.
+TITLES_SQL = 'SELECT "name(eng)" FROM recipes ORDER BY id'
+TITLE_PAIRS_SQL = 'SELECT "name(eng)", "name(th)" FROM recipes ORDER BY id'
+DETAIL_SQL = 'SELECT "name(eng)", "condiments", "howto" FROM recipes WHERE "name(eng)" = ?'
+SEARCH_DOCUMENTS_SQL = 'SELECT "name(eng)", "condiments", "howto" FROM recipes ORDER BY id'
+COUNT_SQL = 'SELECT count(*) FROM recipes'
+CATEGORY_COUNT_SQL = {
+    cat: f'SELECT count(*) FROM recipes WHERE "{cat}" = 1' for cat in CATEGORIES
+}
+# One pass over every protein flag, however many categories there are.
+FLAG_LIST = ", ".join(f'"{cat}"' for cat in CATEGORIES)
+MATERIALISE_STATS_SQL = f"""
+    INSERT INTO category_stats
+    SELECT category, count(*) FILTER (WHERE flag = 1)
+    FROM (UNPIVOT recipes ON {FLAG_LIST} INTO NAME category VALUE flag)
+    GROUP BY category
+"""
+STATS_SQL = "SELECT category, recipes FROM category_stats"
+DISH_INGREDIENTS_SQL = """
+    SELECT i.quantity, i.unit, i.ingredient, i.line
+    FROM ingredients i JOIN recipes r ON r.id = i.recipe_id
+    WHERE r."name(eng)" = ?
+    ORDER BY i.position
+"""
+RECIPE_INGREDIENTS_SQL = "SELECT DISTINCT recipe_id, ingredient FROM ingredients"
+
+# Keyset pagination: each sort is a column plus id as the tie-breaker, and a page starts
+# after the (sort value, id) of the last row of the page before, so page 1000 costs the same
+# as page 1 and only one page of rows ever leaves the database.
+PAGE_SORTS = {
+    "Sheet order": ("id", "ASC"),
+    "Name (A-Z)": ('"name(eng)"', "ASC"),
+    "Name (Z-A)": ('"name(eng)"', "DESC"),
+    "Fewest ingredients": ("ingredient_count", "ASC"),
+    "Most ingredients": ("ingredient_count", "DESC"),
+}
+
+
+def _page_sql(category, sort, after):
+    column, direction = PAGE_SORTS[sort]
+    op = ">" if direction == "ASC" else "<"
+    where = [f'"{category}" = 1'] if category else []
+    if after and column == "id":
+        where.append(f"id {op} ?")
+    elif after:
+        where.append(f"({column} {op} ? OR ({column} = ? AND id {op} ?))")
+    order = f"id {direction}" if column == "id" else f"{column} {direction}, id {direction}"
+    return (
+        f'SELECT id, "name(eng)" AS Menu, "name(th)" AS Thai, ingredient_count AS Ingredients, {column} AS sort_key '
+        f'FROM recipes {"WHERE " + " AND ".join(where) if where else ""} ORDER BY {order} LIMIT ?'
+    )
+
+
+PAGE_SQL = {
+    (category, sort, after): _page_sql(category, sort, after)
+    for category in [None] + CATEGORIES for sort in PAGE_SORTS for after in (False, True)
+}
+
+# Concurrent sessions each borrow their own cursor; at most POOL_SIZE run at once.
+POOL_SIZE = int(os.environ.get("CHEF_AI_DB_POOL_SIZE", 8))
+POOL_TIMEOUT = float(os.environ.get("CHEF_AI_DB_POOL_TIMEOUT", 10))
+
+_load_lock = threading.Lock()
+
+
+class CursorPool:
+    """
+    Bounded pool of DuckDB cursors over one shared in-memory database.
+    Each cursor is an independent connection, so session threads never share a handle.
+    Free cursors are handed to waiting threads in arrival order, so nobody starves.
+    """
+    def __init__(self, con, size=POOL_SIZE):
+        self._con = con
+        self._size = size
+        self._idle = []
+        self._waiters = deque()
+        self._created = 0
+        self._cond = threading.Condition()
+        self._stats = {"checkouts": 0, "waits": 0, "wait_total": 0.0, "wait_max": 0.0, "in_use": 0}
+        # What the database holds, kept with it: a new pool starts with an empty database
+        self.loaded = {"version": None, "sheet_version": None, "generation": None}
+
+    def _acquire(self, timeout):
+        with self._cond:
+            if self._idle:
+                return self._idle.pop()
+            if self._created < self._size:
+                self._created += 1
+                return self._con.cursor()
+            slot = {"cursor": None}
+            self._waiters.append(slot)
+            deadline = time.monotonic() + timeout
+            while slot["cursor"] is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(slot)
+                    raise TimeoutError(f"No database cursor free after {timeout}s (pool size {self._size})")
+                self._cond.wait(remaining)
+            return slot["cursor"]
+
+    def _release(self, cur):
+        with self._cond:
+            self._stats["in_use"] -= 1
+            if self._waiters:
+                self._waiters.popleft()["cursor"] = cur
+                self._cond.notify_all()
+            else:
+                self._idle.append(cur)
+
+    @contextmanager
+    def cursor(self, timeout=POOL_TIMEOUT):
+        start = time.perf_counter()
+        cur = self._acquire(timeout)
+        waited = time.perf_counter() - start
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["wait_total"] += waited
+            self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+            if waited > 0.001:
+                self._stats["waits"] += 1
+        try:
+            yield cur
+        finally:
+            self._release(cur)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats, size=self._size, created=self._created, waiting=len(self._waiters))
+        checkouts = stats["checkouts"] or 1
+        stats["wait_avg"] = stats["wait_total"] / checkouts
+        return stats
+
+
+@st.cache_resource
+def connect_duckdb():
+    con = duckdb.connect(database=':memory:')
+    con.execute(CREATE_RECIPES)
+    con.execute(CREATE_STATS)
+    con.execute(CREATE_INGREDIENTS)
+    for statement in CREATE_INDEXES:
+        con.execute(statement)
+    pool = CursorPool(con)
+    # Checkouts, wait times (seconds) and cursors in use, in the debug panel and /metrics
+    tracer.register_gauges("db_pool", pool.stats)
+    return pool
+
+
+def _load_recipes(con, df, ingredients_df):
+    """
+    Replaces the table contents in one transaction, so readers never see a half-loaded table.
+    """
+    recipes_df = df.reset_index(drop=True)
+    recipes_df.insert(0, "id", range(1, len(recipes_df) + 1))
+    if "source" not in recipes_df.columns:
+        recipes_df["source"] = "sheet"
+    # Snapshots written before the Thai names were read from the sheet lack the column
+    if "name(th)" not in recipes_df.columns:
+        recipes_df["name(th)"] = None
+    counts = ingredients_df.groupby("recipe_id").size()
+    recipes_df["ingredient_count"] = recipes_df["id"].map(counts).fillna(0).astype(int)
+    columns = ", ".join(f'"{col}"' for col in ["id", "name(eng)", "name(th)", "condiments", "howto"] + CATEGORIES + ["source", "ingredient_count"])
+    con.begin()
+    try:
+        con.execute("DELETE FROM recipes")
+        con.register("recipes_df", recipes_df)
+        con.execute(f"INSERT INTO recipes ({columns}) SELECT {columns} FROM recipes_df")
+        con.unregister("recipes_df")
+        con.execute("DELETE FROM ingredients")
+        con.register("ingredients_df", ingredients_df)
+        con.execute("INSERT INTO ingredients SELECT recipe_id, position, quantity, unit, ingredient, line FROM ingredients_df")
+        con.unregister("ingredients_df")
+        con.execute("DELETE FROM category_stats")
+        con.execute(MATERIALISE_STATS_SQL)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+
+def merge_ingested(df, ingested_df):
+    """
+    Appends recipes imported from YouTube after the sheet rows. An imported dish whose name
+    is already taken gets its video ID appended, so every name stays unique.
+    """
+    df = df.assign(source="sheet")
+    if ingested_df is None:
+        return df
+    taken = set(df["name(eng)"])
+    names = []
+    for name, source in zip(ingested_df["name(eng)"], ingested_df["source"]):
+        if name in taken:
+            name = f"{name} (YouTube {source.split(':', 1)[1]})"
+        taken.add(name)
+        names.append(name)
+    ingested_df = ingested_df.assign(**{"name(eng)": names})
+    return pd.concat([df, ingested_df.reindex(columns=df.columns)], ignore_index=True)
+
+
+def sync_recipes():
+    """
+    Makes sure the recipes table holds the current snapshot plus any imported YouTube recipes,
+    and returns the dataset version.
+    """
+    # Imported here so pages get the ingest, transcript and LLM modules only when they use them
+    from video_ingest import load_ingested_recipes, ingest_generation
+
+    df, sheet_version = load_datafood()
+    generation = ingest_generation()
+    with _load_lock:
+        pool = connect_duckdb()
+        loaded = pool.loaded
+        if loaded["sheet_version"] != sheet_version or loaded["generation"] != generation:
+            ingested_df, ingested_version = load_ingested_recipes()
+            version = sheet_version
+            if ingested_version:
+                df = merge_ingested(df, ingested_df)
+                version = f"{sheet_version}-{ingested_version}"
+            if loaded["version"] != version:
+                ingredients_df = load_ingredient_table(df, version)
+                with pool.cursor() as cur, span("duckdb.load_recipes", rows=len(df)):
+                    _load_recipes(cur, df, ingredients_df)
+                loaded["version"] = version
+            loaded["sheet_version"] = sheet_version
+            loaded["generation"] = generation
+        return loaded["version"]
+
+
+def _check_category(category):
+    if category not in CATEGORIES:
+        raise ValueError(f"Unknown category: {category}")
+
+
+# --- 3. PUBLIC QUERY FUNCTIONS ---
+def _span_sql(sql):
+    return " ".join(sql.split())[:80]
+
+
+def _fetchall(sql, params=None):
+    with connect_duckdb().cursor() as cur, span("duckdb.execute", sql=_span_sql(sql)):
+        return cur.execute(sql, params).fetchall()
+
+
+def _fetchone(sql, params=None):
+    with connect_duckdb().cursor() as cur, span("duckdb.execute", sql=_span_sql(sql)):
+        return cur.execute(sql, params).fetchone()
+
+
+def _fetchdf(sql, params=None):
+    with connect_duckdb().cursor() as cur, span("duckdb.execute", sql=_span_sql(sql)):
+        return cur.execute(sql, params).fetchdf()
+
+
+def _fetchnumpy(sql, params=None):
+    with connect_duckdb().cursor() as cur, span("duckdb.execute", sql=_span_sql(sql)):
+        return cur.execute(sql, params).fetchnumpy()
+
+
+def get_titles():
+    return [row[0] for row in _fetchall(TITLES_SQL)]
+
+
+def get_title_pairs():
+    """
+    (English name, Thai name or None) for every dish, for building the autocomplete index.
+    """
+    return _fetchall(TITLE_PAIRS_SQL)
+
+
+def get_dish(name):
+    """
+    Returns (name, condiments, howto) for a dish, or None if it does not exist.
+    """
+    return _fetchone(DETAIL_SQL, [name])
+
+
+def get_dish_ingredients(name):
+    """
+    Parsed ingredient lines of a dish as (quantity, unit, ingredient, original line) rows.
+    """
+    return _fetchall(DISH_INGREDIENTS_SQL, [name])
+
+
+def get_recipe_ingredients():
+    """
+    Distinct (recipe_id, canonical ingredient) pairs as NumPy columns, for building ingredient vectors.
+    """
+    columns = _fetchnumpy(RECIPE_INGREDIENTS_SQL)
+    return np.asarray(columns["recipe_id"], dtype=np.int64), np.asarray(columns["ingredient"], dtype=object)
+
+
+def get_search_documents():
+    """
+    (name, condiments, howto) for every dish, for building the search index.
+    """
+    return _fetchall(SEARCH_DOCUMENTS_SQL)
+
+
+def get_menu_page(category=None, sort="Sheet order", after=None, limit=25):
+    """
+    One page of the menu as (dataframe, cursor for the next page or None).
+    Columns: id, Menu, Thai, Ingredients. `after` is the cursor returned with the page before.
+    """
+    if category is not None:
+        _check_category(category)
+    if sort not in PAGE_SORTS:
+        raise ValueError(f"Unknown sort: {sort}")
+    if after is None:
+        params = []
+    elif PAGE_SORTS[sort][0] == "id":
+        params = [after[1]]
+    else:
+        params = [after[0], after[0], after[1]]
+    # One extra row tells whether there is a next page without counting
+    df = _fetchdf(PAGE_SQL[(category, sort, after is not None)], params + [limit + 1])
+    next_after = None
+    if len(df) > limit:
+        df = df.iloc[:limit]
+        next_after = (df["sort_key"].tolist()[-1], int(df["id"].iloc[-1]))
+    return df.drop(columns="sort_key"), next_after
+
+
+@st.cache_data
+def category_counts(version):
+    """
+    Recipe count per protein category, in CATEGORIES order.
+    Read from the materialised stats table once per dataset version.
+    """
+    counts = dict(_fetchall(STATS_SQL))
+    return {cat: counts.get(cat, 0) for cat in CATEGORIES}
+
+
+def count_recipes(category=None):
+    if category is None:
+        return _fetchone(COUNT_SQL)[0]
+    _check_category(category)
+    return _fetchone(CATEGORY_COUNT_SQL[category])[0]
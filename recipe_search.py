@@ -0,0 +1,108 @@
+import re
+from collections import Counter
+
+import numpy as np
+import streamlit as st
+
+import recipe_db
+
+# --- 1. TOKENISING ---
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "an", "and", "or", "the", "with", "without", "of", "in", "on", "for", "to",
+    "dish", "dishes", "recipe", "recipes", "that", "use", "uses", "using", "some",
+}
+
+# Standard BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    """
+    Lower-cases, drops stopwords and folds simple English plurals ("chillies" -> "chilli").
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS or token.isdigit():
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+# --- 2. INVERTED INDEX ---
+class SearchIndex:
+    """
+    Inverted index over dish name, condiments and instructions.
+    Postings are stored as flat NumPy arrays with the BM25 weight of every
+    (term, dish) pair precomputed, so a query only sums a few array slices.
+    """
+    def __init__(self, names, documents):
+        self.names = list(names)
+        doc_terms = [Counter(tokenize(doc)) for doc in documents]
+        lengths = np.array([sum(terms.values()) for terms in doc_terms], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) else 0.0
+
+        postings = {}
+        for doc_id, terms in enumerate(doc_terms):
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        n_docs = len(doc_terms)
+        self.vocab = {}
+        offsets = [0]
+        doc_ids = []
+        weights = []
+        for term_id, (term, entries) in enumerate(postings.items()):
+            self.vocab[term] = term_id
+            ids = np.array([doc_id for doc_id, _ in entries], dtype=np.int32)
+            tf = np.array([tf for _, tf in entries], dtype=np.float32)
+            idf = np.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = K1 * (1 - B + B * lengths[ids] / max(avg_length, 1e-9))
+            doc_ids.append(ids)
+            weights.append((idf * tf * (K1 + 1) / (tf + norm)).astype(np.float32))
+            offsets.append(offsets[-1] + len(ids))
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32)
+        self.weights = np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32)
+
+    def search(self, query, limit=20):
+        """
+        Returns up to `limit` (dish name, score) pairs, best match first.
+        """
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids:
+            return []
+
+        # Only the postings of the query terms are touched, never the whole collection
+        slices = [slice(self.offsets[t], self.offsets[t + 1]) for t in term_ids]
+        ids = np.concatenate([self.doc_ids[sl] for sl in slices])
+        weights = np.concatenate([self.weights[sl] for sl in slices])
+        candidates, positions = np.unique(ids, return_inverse=True)
+        candidate_scores = np.bincount(positions, weights=weights)
+        if len(candidates) > limit:
+            top = np.argpartition(-candidate_scores, limit)[:limit]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-candidate_scores[top], kind="stable")]
+        return [(self.names[candidates[i]], float(candidate_scores[i])) for i in top]
+
+
+@st.cache_resource(max_entries=2)
+def build_search_index(version):
+    """
+    Builds the index once per dataset version.
+    """
+    rows = recipe_db.get_search_documents()
+    names = [row[0] for row in rows]
+    documents = [" ".join(part or "" for part in row) for row in rows]
+    return SearchIndex(names, documents)
+
+
+def search_recipes(version, query, limit=20):
+    return build_search_index(version).search(query, limit)
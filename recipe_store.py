@@ -0,0 +1,220 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# --- 1. SNAPSHOT SETTINGS ---
+# The "datafoods" sheet is mirrored into a local Parquet file so a cold process
+# can serve every page without waiting on Google Sheets (or its quota).
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("CHEF_AI_CACHE_DIR", os.path.join(APP_DIR, ".cache"))
+SNAPSHOT_PATH = os.path.join(CACHE_DIR, "datafoods.parquet")
+STAMP_PATH = os.path.join(CACHE_DIR, "datafoods.json")
+
+# Set CHEF_AI_SHEET_FIXTURE to a CSV file to use it in place of the real sheet.
+SHEET_FIXTURE = os.environ.get("CHEF_AI_SHEET_FIXTURE")
+SHEET_NAME = "datafoods"
+SHEET_COLUMNS = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+
+KEY_COLUMN = "name(eng)"
+TEXT_COLUMNS = ["name(th)", "name(eng)", "condiments", "howto"]
+CATEGORIES = ['Pork', 'Beef', 'Prawn', 'Chicken', 'Fish', 'Other']
+
+REFRESH_INTERVAL = int(os.environ.get("CHEF_AI_REFRESH_INTERVAL", 300))
+
+_lock = threading.Lock()
+_init_lock = threading.Lock()
+_snapshot = {"df": None, "version": None, "updated_at": None}
+
+
+class FixtureSheet:
+    """
+    Stand-in for GSheetsConnection that reads the sheet from a local CSV file.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def read(self, usecols=None, ttl=None, **options):
+        return pd.read_csv(self.path, usecols=usecols)
+
+
+@st.cache_resource
+def connect_datafood(name=SHEET_NAME):
+    if SHEET_FIXTURE:
+        return FixtureSheet(SHEET_FIXTURE)
+    from streamlit_gsheets import GSheetsConnection
+    return st.connection(name, type=GSheetsConnection)
+
+
+# --- 2. NORMALISING AND VERSIONING ---
+def normalise_recipes(df):
+    """
+    Gives the sheet rows stable types: text columns as strings, protein flags as 0/1 ints.
+    """
+    df = df.dropna(subset=[KEY_COLUMN]).copy()
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("string").str.strip()
+    for col in CATEGORIES:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int8")
+    df = df.drop_duplicates(subset=[KEY_COLUMN], keep="last")
+    return df.reset_index(drop=True)
+
+
+def row_hashes(df):
+    """
+    One 64-bit content hash per recipe, keyed by dish name.
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    return dict(zip(df[KEY_COLUMN], hashes.to_numpy()))
+
+
+def dataset_version(df):
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:12]
+
+
+def diff_recipes(current, fresh):
+    """
+    Compares two snapshots row by row and returns (changed_rows, removed_keys).
+    """
+    old = row_hashes(current)
+    new = row_hashes(fresh)
+    changed_keys = [key for key, h in new.items() if old.get(key) != h]
+    removed_keys = [key for key in old if key not in new]
+    changed_rows = fresh[fresh[KEY_COLUMN].isin(changed_keys)]
+    return changed_rows, removed_keys
+
+
+def apply_changes(current, fresh_order, changed_rows, removed_keys):
+    """
+    Patches only the changed and removed rows into the current snapshot,
+    keeping the row order of the sheet.
+    """
+    touched = set(removed_keys) | set(changed_rows[KEY_COLUMN])
+    kept = current[~current[KEY_COLUMN].isin(touched)]
+    merged = pd.concat([kept, changed_rows], ignore_index=True)
+    order = {key: i for i, key in enumerate(fresh_order)}
+    merged = merged.sort_values(KEY_COLUMN, key=lambda s: s.map(order), kind="stable")
+    return merged.reset_index(drop=True)
+
+
+# --- 3. READING AND WRITING THE SNAPSHOT ---
+def read_snapshot():
+    if not (os.path.exists(SNAPSHOT_PATH) and os.path.exists(STAMP_PATH)):
+        return None, None
+    try:
+        df = pd.read_parquet(SNAPSHOT_PATH)
+        with open(STAMP_PATH) as f:
+            stamp = json.load(f)
+    except Exception:
+        return None, None
+    return normalise_recipes(df), stamp
+
+
+def write_snapshot(df):
+    """
+    Writes the snapshot and its version stamp atomically, then returns the stamp.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    stamp = {
+        "version": dataset_version(df),
+        "rows": len(df),
+        "updated_at": time.time(),
+    }
+    tmp_path = SNAPSHOT_PATH + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, SNAPSHOT_PATH)
+    with open(STAMP_PATH + ".tmp", "w") as f:
+        json.dump(stamp, f)
+    os.replace(STAMP_PATH + ".tmp", STAMP_PATH)
+    return stamp
+
+
+def fetch_sheet(sheet):
+    # ttl=0 bypasses the connection's own cache so we always see the live sheet
+    return normalise_recipes(sheet.read(usecols=SHEET_COLUMNS, ttl=0))
+
+
+def _publish(df, stamp):
+    with _lock:
+        _snapshot["df"] = df
+        _snapshot["version"] = stamp["version"]
+        _snapshot["updated_at"] = stamp["updated_at"]
+
+
+def refresh_snapshot(sheet):
+    """
+    Checks the sheet for changes and patches the snapshot with the changed rows only.
+    Returns the number of rows that were added, changed or removed.
+    """
+    with _lock:
+        current = _snapshot["df"]
+    fresh = fetch_sheet(sheet)
+
+    if current is None:
+        _publish(fresh, write_snapshot(fresh))
+        return len(fresh)
+
+    changed_rows, removed_keys = diff_recipes(current, fresh)
+    if changed_rows.empty and not removed_keys:
+        return 0
+
+    merged = apply_changes(current, fresh[KEY_COLUMN], changed_rows, removed_keys)
+    _publish(merged, write_snapshot(merged))
+    return len(changed_rows) + len(removed_keys)
+
+
+def _refresh_loop(sheet, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            refresh_snapshot(sheet)
+        except Exception as e:
+            logger.warning("Sheet refresh failed: %s", e)
+
+
+@st.cache_resource
+def start_background_refresh(_sheet, interval=REFRESH_INTERVAL):
+    """
+    Starts one refresh thread per server process.
+    """
+    worker = threading.Thread(target=_refresh_loop, args=(_sheet, interval), daemon=True)
+    worker.start()
+    return worker
+
+
+# --- 4. PUBLIC ENTRY POINT ---
+def load_datafood():
+    """
+    Returns (recipes dataframe, dataset version) for the current snapshot.
+    Only the very first start of a fresh install waits on the sheet.
+    """
+    with span("load_datafood"):
+        sheet = connect_datafood(SHEET_NAME)
+
+        with _init_lock:
+            with _lock:
+                loaded = _snapshot["df"] is not None
+            if not loaded:
+                df, stamp = read_snapshot()
+                if df is not None:
+                    _publish(df, stamp)
+                else:
+                    refresh_snapshot(sheet)
+
+        start_background_refresh(sheet)
+
+        with _lock:
+            return _snapshot["df"], _snapshot["version"]
@@ -0,0 +1,190 @@
+import os
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+import streamlit as st
+
+import recipe_db
+from recipe_store import CACHE_DIR
+
+# --- 1. SETTINGS ---
+TOP_K = int(os.environ.get("CHEF_AI_NEIGHBOURS", 20))
+# Similarity scores are computed this many cells (dishes x dishes) at a time, about 64 MB of float32
+BLOCK_CELLS = 16 * 1024 * 1024
+HISTORY_SIZE = 20
+
+
+# --- 2. INGREDIENT VECTORS ---
+def ingredient_matrix(n_dishes, recipe_ids, ingredients):
+    """
+    TF-IDF over canonical ingredients: one L2-normalised sparse row per dish.
+    An ingredient counts once per dish; rare ingredients weigh more than garlic or fish sauce.
+    """
+    vocabulary, term_ids = np.unique(ingredients.astype(str), return_inverse=True)
+    rows = recipe_ids - 1
+    presence = sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, term_ids)),
+        shape=(n_dishes, len(vocabulary))
+    )
+    presence.data[:] = 1.0
+    document_frequency = np.bincount(term_ids, minlength=len(vocabulary))
+    idf = (np.log((1 + n_dishes) / (1 + document_frequency)) + 1).astype(np.float32)
+    weighted = presence @ sp.diags(idf)
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.csr_matrix(sp.diags(1 / norms) @ weighted, dtype=np.float32), vocabulary
+
+
+def top_scores(scores, limit, exclude=()):
+    """
+    Positions and values of the `limit` highest positive scores, best first.
+    """
+    scores = scores.copy()
+    scores[list(exclude)] = 0
+    limit = min(limit, int(np.count_nonzero(scores > 0)))
+    if limit == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=scores.dtype)
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return top, scores[top]
+
+
+def nearest_neighbours(matrix, k=TOP_K, block_cells=BLOCK_CELLS):
+    """
+    Top-k cosine neighbours of every dish, scored a block of dishes at a time.
+    Returns (ids, scores) arrays of shape (n, k); missing neighbours have id -1.
+    """
+    n = matrix.shape[0]
+    k = min(k, max(n - 1, 0))
+    ids = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if k == 0:
+        return ids, scores
+    block = max(1, block_cells // n)
+    for start in range(0, n, block):
+        end = min(start + block, n)
+        similarity = np.asarray(matrix @ matrix[start:end].toarray().T).T
+        similarity[np.arange(end - start), np.arange(start, end)] = -1.0  # never recommend the dish itself
+        top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(similarity, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        top[top_scores <= 0] = -1
+        ids[start:end] = top
+        scores[start:end] = np.maximum(top_scores, 0)
+    return ids, scores
+
+
+# --- 3. RECOMMENDER ---
+class Recommender:
+    """
+    Serves "dishes like this" from a precomputed top-k neighbour table and
+    "based on what you viewed" from one sparse product with the viewing profile.
+    Until the table is ready, neighbours are scored on the fly from the matrix.
+    """
+    def __init__(self, names, matrix):
+        self.names = list(names)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        self.matrix = matrix
+        self.transposed = matrix.T.tocsr()
+        self.neighbour_ids = None
+        self.neighbour_scores = None
+
+    def set_table(self, neighbour_ids, neighbour_scores):
+        self.neighbour_scores = neighbour_scores
+        self.neighbour_ids = neighbour_ids
+
+    def _scores(self, profile):
+        return np.asarray((profile @ self.transposed).todense()).ravel()
+
+    def similar(self, name, limit=5):
+        """
+        (dish name, cosine similarity) pairs for the dishes whose ingredients are closest to `name`.
+        """
+        position = self.positions.get(name)
+        if position is None:
+            return []
+        neighbour_ids = self.neighbour_ids
+        if neighbour_ids is not None and limit <= neighbour_ids.shape[1]:
+            ids = neighbour_ids[position, :limit]
+            scores = self.neighbour_scores[position, :limit]
+        else:
+            ids, scores = top_scores(self._scores(self.matrix[position]), limit, exclude=[position])
+        return [(self.names[i], float(s)) for i, s in zip(ids, scores) if i >= 0]
+
+    def for_history(self, viewed, limit=5):
+        """
+        Dishes closest to the sum of the viewed dishes' vectors, with recent views
+        counting more, leaving out the dishes already viewed.
+        """
+        positions = [self.positions[name] for name in viewed if name in self.positions]
+        if not positions:
+            return []
+        recency = np.linspace(0.5, 1.0, len(positions), dtype=np.float32)
+        profile = sp.csr_matrix(recency) @ self.matrix[positions]
+        ids, scores = top_scores(self._scores(profile), limit, exclude=positions)
+        return [(self.names[i], float(s)) for i, s in zip(ids, scores)]
+
+
+def _neighbours_path(version):
+    return os.path.join(CACHE_DIR, f"neighbours-{version}.npz")
+
+
+def _build_table(recommender, path):
+    ids, scores = nearest_neighbours(recommender.matrix)
+    recommender.set_table(ids, scores)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, ids=ids, scores=scores)
+    os.replace(tmp_path, path)
+
+
+@st.cache_resource(max_entries=2)
+def build_recommender(version):
+    """
+    Builds the ingredient vectors for a dataset version and loads its neighbour table,
+    computing and saving the table on the first call. Large catalogues compute it
+    in a background thread so the page does not wait.
+    """
+    names = recipe_db.get_titles()
+    recipe_ids, ingredients = recipe_db.get_recipe_ingredients()
+    matrix, _ = ingredient_matrix(len(names), recipe_ids, ingredients)
+    recommender = Recommender(names, matrix)
+    path = _neighbours_path(version)
+    if os.path.exists(path):
+        table = np.load(path)
+        if table["ids"].shape[0] == len(names):
+            recommender.set_table(table["ids"], table["scores"])
+            return recommender
+    if len(names) ** 2 <= BLOCK_CELLS:
+        _build_table(recommender, path)
+    else:
+        threading.Thread(target=_build_table, args=(recommender, path), daemon=True,
+                         name=f"neighbours-{version}").start()
+    return recommender
+
+
+def similar_dishes(version, name, limit=5):
+    return build_recommender(version).similar(name, limit)
+
+
+# --- 4. VIEW HISTORY ---
+def remember_view(name):
+    """
+    Keeps the last few dishes this session looked at, most recent last.
+    """
+    if not name:
+        return
+    viewed = st.session_state.setdefault("viewed_dishes", [])
+    if viewed and viewed[-1] == name:
+        return
+    if name in viewed:
+        viewed.remove(name)
+    viewed.append(name)
+    del viewed[:-HISTORY_SIZE]
+
+
+def recommend_for_session(version, limit=5):
+    return build_recommender(version).for_history(st.session_state.get("viewed_dishes", []), limit)
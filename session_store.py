@@ -0,0 +1,306 @@
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+import streamlit as st
+
+from recipe_store import CACHE_DIR
+from tracing import debug_enabled
+
+# --- 1. SETTINGS ---
+SESSION_DB_PATH = os.path.join(CACHE_DIR, "sessions.sqlite")
+# Stored (compressed) bytes one browser session may hold; the oldest chat messages go first
+SESSION_MAX_BYTES = int(os.environ.get("CHEF_AI_SESSION_MAX_BYTES", 256 * 1024))
+# Sessions not seen for this long are deleted, whether or not the browser tab is still open
+SESSION_IDLE_TTL = int(os.environ.get("CHEF_AI_SESSION_IDLE_TTL", 2 * 3600))
+# A session's last-seen time is written at most this often, and idle sessions swept at most this often
+TOUCH_INTERVAL = 30
+EVICT_INTERVAL = 60
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        created_at REAL NOT NULL,
+        last_seen REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS messages (
+        session_id TEXT NOT NULL,
+        chat TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        added_at REAL NOT NULL,
+        PRIMARY KEY (session_id, chat, seq)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS texts (
+        session_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        content BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        PRIMARY KEY (session_id, name)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions(last_seen);
+"""
+
+
+def _pack(text):
+    return zlib.compress(text.encode(), 6)
+
+
+def _unpack(blob):
+    return zlib.decompress(blob).decode()
+
+
+# --- 2. STORE ---
+class SessionStore:
+    """
+    Chat histories and long per-session texts (e.g. an extracted recipe), kept in SQLite
+    with one zlib-compressed row per message instead of in every session's state.
+    Each session is capped at max_bytes stored, and sessions idle for idle_ttl are deleted.
+    """
+    def __init__(self, path=SESSION_DB_PATH, max_bytes=SESSION_MAX_BYTES, idle_ttl=SESSION_IDLE_TTL):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._last_evicted = 0.0
+        self._stats = {"trimmed_messages": 0, "evicted_sessions": 0}
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        Runs the block as one transaction, rolled back if any statement in it fails.
+        The caller holds the lock.
+        """
+        self._db.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def touch(self, session_id):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (session_id, created_at, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (session_id, now, now),
+            )
+            if now - self._last_evicted > EVICT_INTERVAL:
+                self._last_evicted = now
+                self._evict_idle(now)
+
+    def _evict_idle(self, now):
+        cutoff = now - self.idle_ttl
+        idle = "SELECT session_id FROM sessions WHERE last_seen < ?"
+        with self._transaction():
+            self._db.execute(f"DELETE FROM messages WHERE session_id IN ({idle})", (cutoff,))
+            self._db.execute(f"DELETE FROM texts WHERE session_id IN ({idle})", (cutoff,))
+            evicted = self._db.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,)).rowcount
+        self._stats["evicted_sessions"] += evicted
+
+    # --- Chats ---
+    def messages(self, session_id, chat):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND chat = ? ORDER BY seq",
+                (session_id, chat),
+            ).fetchall()
+        return [{"role": role, "content": _unpack(content)} for role, content in rows]
+
+    def offset(self, session_id, chat):
+        """
+        How many messages of the chat were trimmed off the front to stay under the cap.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT min(seq) FROM messages WHERE session_id = ? AND chat = ?", (session_id, chat)
+            ).fetchone()
+        return row[0] or 0
+
+    def append(self, session_id, chat, role, content):
+        blob = _pack(content)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO messages (session_id, chat, seq, role, content, size, added_at) "
+                "SELECT ?, ?, coalesce(max(seq) + 1, 0), ?, ?, ?, ? FROM messages WHERE session_id = ? AND chat = ?",
+                (session_id, chat, role, blob, len(blob), time.time(), session_id, chat),
+            )
+            self._trim(session_id)
+
+    def pop(self, session_id, chat):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM messages WHERE session_id = ? AND chat = ? AND seq = "
+                "(SELECT max(seq) FROM messages WHERE session_id = ? AND chat = ?)",
+                (session_id, chat, session_id, chat),
+            )
+
+    def reset(self, session_id, chat, messages=()):
+        now = time.time()
+        with self._lock:
+            with self._transaction():
+                self._db.execute("DELETE FROM messages WHERE session_id = ? AND chat = ?", (session_id, chat))
+                for seq, message in enumerate(messages):
+                    blob = _pack(message["content"])
+                    self._db.execute(
+                        "INSERT INTO messages (session_id, chat, seq, role, content, size, added_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (session_id, chat, seq, message["role"], blob, len(blob), now),
+                    )
+            self._trim(session_id)
+
+    # --- Texts ---
+    def get_text(self, session_id, name):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content FROM texts WHERE session_id = ? AND name = ?", (session_id, name)
+            ).fetchone()
+        return _unpack(row[0]) if row else None
+
+    def set_text(self, session_id, name, text):
+        with self._lock:
+            if text is None:
+                self._db.execute("DELETE FROM texts WHERE session_id = ? AND name = ?", (session_id, name))
+                return
+            blob = _pack(text)
+            self._db.execute(
+                "INSERT OR REPLACE INTO texts (session_id, name, content, size) VALUES (?, ?, ?, ?)",
+                (session_id, name, blob, len(blob)),
+            )
+            self._trim(session_id)
+
+    # --- Limits ---
+    def _session_bytes(self, session_id):
+        return self._db.execute(
+            "SELECT (SELECT coalesce(sum(size), 0) FROM messages WHERE session_id = ?)"
+            " + (SELECT coalesce(sum(size), 0) FROM texts WHERE session_id = ?)",
+            (session_id, session_id),
+        ).fetchone()[0]
+
+    def _trim(self, session_id):
+        """
+        Drops the session's oldest messages, across all its chats, until it is under the cap.
+        The newest message of each chat is always kept.
+        """
+        excess = self._session_bytes(session_id) - self.max_bytes
+        if excess <= 0:
+            return
+        rows = self._db.execute(
+            "SELECT chat, seq, size FROM messages m WHERE session_id = ? "
+            "AND seq < (SELECT max(seq) FROM messages WHERE session_id = m.session_id AND chat = m.chat) "
+            "ORDER BY added_at, seq",
+            (session_id,),
+        ).fetchall()
+        dropped = []
+        for chat, seq, size in rows:
+            if excess <= 0:
+                break
+            dropped.append((session_id, chat, seq))
+            excess -= size
+        self._db.executemany("DELETE FROM messages WHERE session_id = ? AND chat = ? AND seq = ?", dropped)
+        self._stats["trimmed_messages"] += len(dropped)
+
+    def report(self):
+        """
+        What the store holds: totals, the largest sessions and the size of the database file.
+        """
+        with self._lock:
+            sessions, messages, message_bytes = self._db.execute(
+                "SELECT (SELECT count(*) FROM sessions), count(*), coalesce(sum(size), 0) FROM messages"
+            ).fetchone()
+            texts, text_bytes = self._db.execute("SELECT count(*), coalesce(sum(size), 0) FROM texts").fetchone()
+            largest = self._db.execute(
+                "SELECT session_id, sum(size) AS bytes FROM ("
+                " SELECT session_id, size FROM messages UNION ALL SELECT session_id, size FROM texts"
+                ") GROUP BY session_id ORDER BY bytes DESC LIMIT 5"
+            ).fetchall()
+            page_count = self._db.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+            stats = dict(self._stats)
+        stored = message_bytes + text_bytes
+        return dict(
+            stats, sessions=sessions, messages=messages, texts=texts, stored_bytes=stored,
+            mean_session_bytes=stored / sessions if sessions else 0.0,
+            db_file_bytes=page_count * page_size, max_session_bytes=self.max_bytes,
+            largest_sessions=[{"session": sid[:8], "bytes": size} for sid, size in largest],
+        )
+
+
+@st.cache_resource
+def get_session_store():
+    return SessionStore()
+
+
+# --- 3. THIS SESSION ---
+def current_session_id():
+    """
+    The ID this browser session's rows are stored under. Marks the session as active
+    (at most every TOUCH_INTERVAL seconds), which also sweeps out idle sessions.
+    """
+    session_id = st.session_state.get("session_id")
+    if session_id is None:
+        session_id = st.session_state.session_id = uuid.uuid4().hex
+    now = time.time()
+    if now - st.session_state.get("session_seen_at", 0.0) > TOUCH_INTERVAL:
+        get_session_store().touch(session_id)
+        st.session_state.session_seen_at = now
+    return session_id
+
+
+def load_chat(chat):
+    return get_session_store().messages(current_session_id(), chat)
+
+
+def chat_offset(chat):
+    return get_session_store().offset(current_session_id(), chat)
+
+
+def append_message(chat, role, content):
+    get_session_store().append(current_session_id(), chat, role, content)
+
+
+def pop_message(chat):
+    get_session_store().pop(current_session_id(), chat)
+
+
+def reset_chat(chat, messages=()):
+    get_session_store().reset(current_session_id(), chat, messages)
+
+
+def load_text(name):
+    return get_session_store().get_text(current_session_id(), name)
+
+
+def save_text(name, text):
+    get_session_store().set_text(current_session_id(), name, text)
+
+
+# --- 4. REPORT ---
+def render_session_report():
+    """
+    Sidebar panel with the session store's memory use, shown alongside the debug timings.
+    """
+    if not debug_enabled():
+        return
+    report = get_session_store().report()
+    with st.sidebar.expander("🗄️ Debug: session store"):
+        st.caption(
+            f"{report['sessions']} sessions, {report['messages']} messages, {report['texts']} texts: "
+            f"{report['stored_bytes'] / 1024:.1f} KB stored "
+            f"(cap {report['max_session_bytes'] / 1024:.0f} KB per session), "
+            f"{report['db_file_bytes'] / 1024:.0f} KB on disk"
+        )
+        st.caption(f"Trimmed {report['trimmed_messages']} messages, evicted {report['evicted_sessions']} idle sessions")
+        st.dataframe(report["largest_sessions"], use_container_width=True)
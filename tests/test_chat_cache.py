@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from chat_cache import AnswerCache, question_ingredients, question_intent
+
+DISH = "Tom Yum Goong"
+MODEL = "stub"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(path=str(tmp_path / "chat_cache.sqlite"))
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("sub for galangal?", "What can I replace galangal with?"),
+    ("What is a good substitute for fish sauce?", "fish sauce alternatives please"),
+    ("What is galangal?", "what's galangal"),
+])
+def test_paraphrases_share_an_answer(cache, stored, asked):
+    cache.put(DISH, stored, MODEL, "answer")
+    assert cache.get(DISH, asked, MODEL) == "answer"
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("What is galangal?", "What can I use if I don't have galangal?"),
+    ("What can I use if I don't have galangal?", "What is galangal?"),
+    ("What is fish sauce?", "Can I make it without fish sauce?"),
+    ("How do I cook the prawns?", "What can I use instead of prawns?"),
+    ("What are kaffir lime leaves?", "I ran out of kaffir lime leaves"),
+    ("Can I use pork instead of chicken?", "Can I use chicken instead of pork?"),
+    ("What can I use instead of lime leaves?", "What can I use instead of lime?"),
+])
+def test_near_misses_do_not_match(cache, stored, asked):
+    cache.put(DISH, stored, MODEL, "answer")
+    assert cache.get(DISH, asked, MODEL) is None
+
+
+def test_question_intent():
+    assert question_intent("What can I use if I don't have galangal?") == "substitute"
+    assert question_intent("What is galangal?") == "definition"
+    assert question_intent("How hot should the wok be?") == "method"
+
+
+def test_question_ingredients():
+    assert question_ingredients("Can I use pork instead of chicken?") == ("pork", "chicken")
+    assert question_ingredients("What can I use instead of lime leaves?") == ("kaffir lime leaf",)
+    assert question_ingredients("What's galangal?") == ("galangal",)
@@ -0,0 +1,129 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from llm_backend import SharedBackend, StubBackend
+from rate_limit import QueueFullError, RequestQueue, TokenBucket
+
+MESSAGES = [{"role": "user", "content": "What can I use instead of palm sugar?"}]
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.005)
+
+
+class GatedStub(StubBackend):
+    """
+    Stub backend whose replies wait for `gate`, so tests can join a call while it is in flight.
+    Records the first message of every upstream call, in the order they start.
+    """
+    def __init__(self, fail_after=None):
+        super().__init__("stub", tokens_per_sec=0)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail_after = fail_after
+        self.calls = []
+
+    def stream(self, messages, system_instruction=None, thinking_budget=None):
+        self.calls.append(messages[0]["content"])
+        self.gate.wait(5)
+        for i, chunk in enumerate(super().stream(messages, system_instruction, thinking_budget)):
+            if i == self.fail_after:
+                raise RuntimeError("upstream down")
+            yield chunk
+
+
+def shared_backend(backend, rate=1000.0, burst=100, max_waiting=10, timeout=5):
+    return SharedBackend(backend, RequestQueue(TokenBucket(rate, burst), max_waiting, timeout))
+
+
+def ask(content):
+    return [{"role": "user", "content": content}]
+
+
+def test_identical_requests_share_one_call():
+    backend = GatedStub()
+    backend.gate.clear()
+    shared = shared_backend(backend)
+    first = shared.stream(MESSAGES)
+    second = shared.stream(MESSAGES)
+    backend.gate.set()
+    assert "".join(first) == "".join(second) == backend._reply(MESSAGES, None)
+    assert backend.calls == [MESSAGES[0]["content"]]
+    assert shared.stats()["shared"] == {"flights": 1, "joined": 1, "in_flight": 0}
+    # Once the call has finished, the same request starts a new one
+    "".join(shared.stream(MESSAGES))
+    assert len(backend.calls) == 2
+
+
+def test_an_upstream_error_reaches_every_joiner():
+    backend = GatedStub(fail_after=2)
+    backend.gate.clear()
+    shared = shared_backend(backend)
+    followers = [shared.stream(MESSAGES), shared.stream(MESSAGES)]
+    backend.gate.set()
+    for follower in followers:
+        received = []
+        with pytest.raises(RuntimeError, match="upstream down"):
+            for chunk in follower:
+                received.append(chunk)
+        assert len(received) == 2
+    assert len(backend.calls) == 1
+
+
+def test_a_full_queue_turns_callers_away():
+    backend = GatedStub()
+    # One token, then one every quarter second: the next caller holds the line while it waits
+    shared = shared_backend(backend, rate=4, burst=1, max_waiting=1)
+    shared.generate(ask("first"))
+    served = threading.Thread(target=shared.generate, args=(ask("second"),))
+    served.start()
+    wait_until(lambda: shared.queue._busy)
+    queued = threading.Thread(target=shared.generate, args=(ask("third"),))
+    queued.start()
+    wait_until(lambda: shared.queue.stats()["waiting"] == 1)
+    with pytest.raises(QueueFullError):
+        shared.generate(ask("fourth"))
+    served.join(5)
+    queued.join(5)
+    assert backend.calls == ["first", "second", "third"]
+    assert shared.queue.stats()["rejected"] == 1
+
+
+def test_a_caller_not_served_in_time_times_out():
+    backend = GatedStub()
+    # The second token is two seconds away, well past the queue's timeout
+    shared = shared_backend(backend, rate=0.5, burst=1, timeout=0.1)
+    shared.generate(ask("first"))
+    with pytest.raises(QueueFullError):
+        shared.generate(ask("second"))
+    stats = shared.queue.stats()
+    assert stats["timed_out"] == 1
+    assert stats["waiting"] == 0
+    assert backend.calls == ["first"]
+
+
+def test_interactive_calls_go_before_background_ones():
+    backend = GatedStub()
+    shared = shared_backend(backend, rate=4, burst=1)
+    shared.generate(ask("warm"))
+    threads = [threading.Thread(target=shared.generate, args=(ask("busy"),))]
+    threads[0].start()
+    wait_until(lambda: shared.queue._busy)
+    # Background calls queue first, yet every interactive call still goes ahead of them
+    for content, lane in [("b0", shared.background()), ("b1", shared.background()), ("i0", shared), ("i1", shared)]:
+        thread = threading.Thread(target=lane.generate, args=(ask(content),))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: shared.queue.stats()["waiting"] == len(threads) - 1)
+    for thread in threads:
+        thread.join(10)
+    assert backend.calls == ["warm", "busy", "i0", "i1", "b0", "b1"]
@@ -0,0 +1,92 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import duckdb
+import pandas as pd
+import pytest
+
+import recipe_db
+import video_ingest
+from ingredients import parse_recipes
+from recipe_db import CursorPool
+from recipe_store import APP_DIR, normalise_recipes
+
+FIXTURE = os.path.join(APP_DIR, "fixtures", "datafoods.csv")
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def pool():
+    return CursorPool(duckdb.connect(database=":memory:"), size=1)
+
+
+def test_waiters_get_the_cursor_in_arrival_order(pool):
+    order = []
+
+    def borrow(name):
+        with pool.cursor(timeout=5):
+            order.append(name)
+
+    with pool.cursor():
+        threads = []
+        for name in ("first", "second", "third"):
+            thread = threading.Thread(target=borrow, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # Start the next thread only once this one is queued
+            wait_until(lambda: pool.stats()["waiting"] == len(threads))
+    for thread in threads:
+        thread.join(5)
+    assert order == ["first", "second", "third"]
+    assert pool.stats()["checkouts"] == 4
+
+
+def test_waiting_past_the_timeout_raises(pool):
+    with pool.cursor():
+        with pytest.raises(TimeoutError):
+            with pool.cursor(timeout=0.05):
+                pass
+        assert pool.stats()["waiting"] == 0
+    # The timed-out waiter left the queue, so the freed cursor is idle again
+    with pool.cursor(timeout=0.05) as cur:
+        assert cur.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_in_use_counts_checked_out_cursors():
+    pool = CursorPool(duckdb.connect(database=":memory:"), size=2)
+    with pool.cursor():
+        with pool.cursor():
+            assert pool.stats()["in_use"] == 2
+        assert pool.stats()["in_use"] == 1
+    with pytest.raises(ValueError):
+        with pool.cursor():
+            raise ValueError("query failed")
+    stats = pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == 3
+    assert stats["created"] == 2
+
+
+def test_a_new_pool_is_loaded_again(monkeypatch):
+    df = normalise_recipes(pd.read_csv(FIXTURE))
+    monkeypatch.setattr(recipe_db, "load_datafood", lambda: (df, "fixture"))
+    monkeypatch.setattr(recipe_db, "load_ingredient_table", lambda df, version: parse_recipes(df.reset_index(drop=True)))
+    monkeypatch.setattr(video_ingest, "load_ingested_recipes", lambda: (None, ""))
+    monkeypatch.setattr(video_ingest, "ingest_generation", lambda: 0)
+    recipe_db.connect_duckdb.clear()
+    assert recipe_db.sync_recipes() == "fixture"
+    assert recipe_db.count_recipes() == len(df)
+    # Clearing the resource cache drops the database; the next sync must fill the new one
+    recipe_db.connect_duckdb.clear()
+    assert recipe_db.sync_recipes() == "fixture"
+    assert recipe_db.count_recipes() == len(df)
@@ -0,0 +1,19 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from theme_assets import FONT_FILES, FONTS_DIR, PALETTES, STATIC_DIR, compile_theme, theme_file
+
+
+@pytest.mark.parametrize("mode", list(PALETTES))
+def test_committed_stylesheet_is_current(mode):
+    # Fails after a palette change until `python theme_assets.py` is run and the result committed
+    assert os.path.exists(os.path.join(STATIC_DIR, theme_file(mode, compile_theme(mode))))
+
+
+@pytest.mark.parametrize("file", [file for file, _ in FONT_FILES.values()])
+def test_fonts_are_committed(file):
+    assert os.path.getsize(os.path.join(FONTS_DIR, file)) > 0
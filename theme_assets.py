@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import os
+
+import streamlit as st
+
+from recipe_store import APP_DIR
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# --- 1. SETTINGS ---
+# Served by Streamlit at app/static/ (needs server.enableStaticServing in .streamlit/config.toml)
+STATIC_DIR = os.path.join(APP_DIR, "static")
+FONTS_DIR = os.path.join(STATIC_DIR, "fonts")
+STATIC_URL = "app/static"
+
+# (family, weight) -> (file in static/fonts, installed font name tried first).
+# The files are committed; static/fonts/README.md says where they come from.
+FONT_FILES = {
+    ("Merriweather", 700): ("merriweather-latin-700-normal.woff2", "Merriweather Bold"),
+    ("Merriweather", 900): ("merriweather-latin-900-normal.woff2", "Merriweather Black"),
+    ("Lato", 400): ("lato-latin-400-normal.woff2", "Lato Regular"),
+    ("Lato", 700): ("lato-latin-700-normal.woff2", "Lato Bold"),
+}
+
+PALETTES = {
+    "dark": {
+        "bg_color": "#121212",            # Deep Dark Background
+        "sidebar_bg": "#1E1E1E",          # Dark Sidebar
+        "text_color": "#E0E0E0",          # Light Grey Text (Readable)
+        "header_color": "#FF9F43",        # Bright Orange for Headers
+        "card_bg": "#2C2C2C",
+        "input_bg": "#333333",
+        "input_border": "#555555",
+        "link_text_color": "#FFD700",     # Gold for links/buttons in dark mode
+    },
+    "light": {
+        "bg_color": "#FFFFFF",
+        "sidebar_bg": "#FEF9E7",          # Cream Sidebar
+        "text_color": "#2C3E50",          # Dark Blue-Grey Text
+        "header_color": "#D35400",        # Pumpkin Spice
+        "card_bg": "#FFF5E6",             # Very Light Orange
+        "input_bg": "#FFFFFF",
+        "input_border": "#F5B041",
+        "link_text_color": "#D35400",     # Dark Orange for links
+    },
+}
+
+FONT_FACE_TEMPLATE = """
+@font-face {{
+    font-family: '{family}';
+    font-style: normal;
+    font-weight: {weight};
+    font-display: swap;
+    src: local('{local_name}'), url('{fonts_url}/{file}') format('woff2');
+}}
+"""
+
+THEME_TEMPLATE = """
+/* MAIN APP COLORS */
+.stApp {{
+    background-color: {bg_color};
+    color: {text_color};
+    font-family: 'Lato', sans-serif;
+}}
+
+/* HEADERS */
+h1, h2, h3, .stMarkdown h1, .stMarkdown h2, .stMarkdown h3 {{
+    font-family: 'Merriweather', serif !important;
+    color: {header_color} !important;
+}}
+
+/* TEXT COLOR OVERRIDES (Fixes grey text in dark mode) */
+p, .stMarkdown, .stText, label {{
+    color: {text_color} !important;
+}}
+
+/* --- FIX: PAGE LINK / BUTTON TEXT VISIBILITY --- */
+/* This specifically targets the text inside st.page_link to ensure it's visible */
+.stPageLink a p {{
+    color: {link_text_color} !important;
+    font-weight: 700 !important;
+    font-size: 1.1rem !important;
+}}
+/* Icon color inside page link */
+.stPageLink a span {{
+     color: {text_color} !important;
+}}
+/* Hover effect for page links */
+.stPageLink a:hover {{
+    background-color: rgba(230, 126, 34, 0.2) !important;
+    border-radius: 8px;
+}}
+
+/* --- FIX: INPUT FIELDS (Youtube & Chat) --- */
+/* Forces background and text color for inputs */
+.stTextInput input, .stSelectbox div[data-baseweb="select"] {{
+    background-color: {input_bg} !important;
+    color: {text_color} !important;
+    border: 1px solid {input_border} !important;
+}}
+/* Placeholder text color */
+::placeholder {{
+    color: {text_color} !important;
+    opacity: 0.5;
+}}
+
+/* SIDEBAR */
+[data-testid="stSidebar"] {{
+    background-color: {sidebar_bg};
+    border-right: 1px solid {input_border};
+}}
+
+/* CARDS / CONTAINERS */
+div[data-testid="stVerticalBlock"] > div[style*="flex-direction: column;"] > div[data-testid="stVerticalBlock"] {{
+    background-color: {card_bg};
+    border-radius: 12px;
+    border: 1px solid {input_border};
+    padding: 15px;
+}}
+
+/* BUTTONS */
+.stButton > button {{
+    background-color: #E67E22;
+    color: white !important;
+    border: none;
+    border-radius: 8px;
+    font-weight: bold;
+}}
+.stButton > button:hover {{
+    background-color: #D35400;
+}}
+"""
+
+
+# --- 2. COMPILING ---
+def compile_theme(mode, fonts_url="fonts"):
+    """
+    Full stylesheet for one palette: the bundled font faces followed by the theme rules.
+    fonts_url is where the font files are, relative to the stylesheet.
+    """
+    font_faces = "".join(
+        FONT_FACE_TEMPLATE.format(family=family, weight=weight, file=file, local_name=local_name, fonts_url=fonts_url)
+        for (family, weight), (file, local_name) in FONT_FILES.items()
+    )
+    return font_faces + THEME_TEMPLATE.format(**PALETTES[mode])
+
+
+def theme_file(mode, css):
+    """
+    Content-hashed file name, so browsers can cache a stylesheet for good and a changed
+    palette always gets a new URL.
+    """
+    digest = hashlib.sha256(css.encode()).hexdigest()[:12]
+    return f"theme-{mode}-{digest}.css"
+
+
+def write_theme(mode, css):
+    """
+    Writes one stylesheet into static/ and removes older builds of its palette. Only run
+    by `python theme_assets.py`; the built files are committed. Returns the file name.
+    """
+    name = theme_file(mode, css)
+    with open(os.path.join(STATIC_DIR, name), "w", newline="\n") as f:
+        f.write(css)
+    # Older builds of the same palette are no longer referenced
+    for old in os.listdir(STATIC_DIR):
+        if old.startswith(f"theme-{mode}-") and old.endswith(".css") and old != name:
+            try:
+                os.remove(os.path.join(STATIC_DIR, old))
+            except OSError:
+                pass
+    return name
+
+
+@st.cache_resource
+def build_theme_assets():
+    """
+    Finds the precompiled stylesheet of each palette once per server process and returns
+    {mode: stylesheet URL}. Nothing is written at runtime: a palette whose build is
+    missing or out of date maps to None and is inlined instead.
+    """
+    urls = {}
+    for mode in PALETTES:
+        name = theme_file(mode, compile_theme(mode))
+        if os.path.exists(os.path.join(STATIC_DIR, name)):
+            urls[mode] = f"{STATIC_URL}/{name}"
+        else:
+            logger.warning("static/%s is missing; run `python theme_assets.py` to rebuild the theme", name)
+            urls[mode] = None
+    return urls
+
+
+def theme_tag(dark_mode):
+    """
+    The per-rerun injection: a one-line import of the precompiled stylesheet.
+    """
+    mode = "dark" if dark_mode else "light"
+    url = build_theme_assets()[mode]
+    if url is None:
+        return f"<style>{compile_theme(mode, fonts_url=f'{STATIC_URL}/fonts')}</style>"
+    return f"<style>@import url('{url}');</style>"
+
+
+def inject_food_theme():
+    """
+    Injects global CSS for the Food/Recipe Theme and handles Light/Dark mode toggling.
+    Lives here rather than in chat_mode, so pages without the chat don't load the LLM modules.
+    """
+    with span("inject_food_theme"):
+        # --- 1. THEME TOGGLE LOGIC ---
+        if 'dark_mode' not in st.session_state:
+            st.session_state.dark_mode = False # Default to Dark Mode for better initial impression
+
+        with st.sidebar:
+            st.session_state.dark_mode = st.toggle("🌙 Dark Mode", value=st.session_state.dark_mode)
+
+        # --- 2. LINK THE PRECOMPILED STYLESHEET ---
+        # Both palettes are precompiled into static/, so each rerun only sends a
+        # one-line reference instead of the whole stylesheet.
+        st.markdown(theme_tag(st.session_state.dark_mode), unsafe_allow_html=True)
+
+
+# --- 3. BUILD ---
+def build_stylesheets():
+    """
+    Compiles both palettes into static/. Run after changing a palette or the fonts.
+    """
+    for mode in PALETTES:
+        name = write_theme(mode, compile_theme(mode))
+        print(f"Wrote static/{name}")
+
+
+if __name__ == "__main__":
+    build_stylesheets()
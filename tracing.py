@@ -0,0 +1,296 @@
+import bisect
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+
+# --- 1. SETTINGS ---
+# Every span updates the duration histograms (a lock and a few additions); only a
+# sampled fraction is kept as a full record for the debug panel and the JSONL file.
+TRACE_SAMPLE_RATE = float(os.environ.get("CHEF_AI_TRACE_SAMPLE", 0.05))
+# Set to a file path to append sampled spans as JSON lines.
+TRACE_FILE = os.environ.get("CHEF_AI_TRACE_FILE")
+# Set to a port number to serve Prometheus metrics at http://<host>:<port>/metrics.
+METRICS_PORT = os.environ.get("CHEF_AI_METRICS_PORT")
+# CHEF_AI_DEBUG=1 (or ?debug=1 in the page URL) shows the timings panel and traces every span of that rerun.
+DEBUG = os.environ.get("CHEF_AI_DEBUG") == "1"
+RECENT_SPANS = 500
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKENS_PER_SEC_BUCKETS = (5, 10, 20, 50, 100, 200, 500)
+
+
+# --- 2. METRICS ---
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Tracer:
+    """
+    Process-wide span collector: duration histograms for every span, plus a ring
+    buffer (and optional JSONL file) of the sampled ones.
+    """
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE, trace_file=TRACE_FILE):
+        self.sample_rate = sample_rate
+        self.trace_file = trace_file
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._recent = deque(maxlen=RECENT_SPANS)
+        self._local = threading.local()
+        self._pages = {}
+        self._gauges = {}
+
+    def begin_rerun(self, force_sample=False, page=None):
+        """
+        Marks the start of a script run on this thread. With force_sample, every span
+        of the run is recorded, which is what the debug panel shows.
+        """
+        self._local.rerun = uuid.uuid4().hex[:8]
+        self._local.force = force_sample
+        self._local.page = (page, time.perf_counter()) if page else None
+
+    def end_page(self):
+        """
+        Records how long this run took to draw its page. The first run of each page in the
+        process is kept apart: it pays for the imports and cold caches a first visitor waits for.
+        """
+        started = getattr(self._local, "page", None)
+        if started is None:
+            return
+        self._local.page = None
+        page, start = started
+        seconds = time.perf_counter() - start
+        with self._lock:
+            first = page not in self._pages
+            stats = self._pages.setdefault(page, {"page": page, "first_ms": round(seconds * 1000, 1),
+                                                  "first_at": time.time(), "runs": 0, "total_s": 0.0})
+            stats["runs"] += 1
+            stats["total_s"] += seconds
+        self.observe("chef_ai_page_render_seconds", seconds, page=page, run="first" if first else "repeat")
+        self.record("page.render", seconds, page=page, first=first)
+
+    def page_renders(self):
+        """
+        Per page, in the order first visited: first run and mean run time in milliseconds.
+        """
+        with self._lock:
+            pages = sorted((dict(stats) for stats in self._pages.values()), key=lambda stats: stats["first_at"])
+        return [{"page": s["page"], "first_ms": s["first_ms"], "runs": s["runs"],
+                 "mean_ms": round(s["total_s"] / s["runs"] * 1000, 1)} for s in pages]
+
+    def current_rerun(self):
+        return getattr(self._local, "rerun", None)
+
+    def _sampled(self):
+        return getattr(self._local, "force", False) or random.random() < self.sample_rate
+
+    def observe(self, metric, value, buckets=SECONDS_BUCKETS, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def record(self, name, seconds, error=None, **attrs):
+        """
+        Records a span that was timed elsewhere (e.g. an LLM stream that finished in another generator).
+        """
+        self.observe("chef_ai_span_seconds", seconds, span=name)
+        if not self._sampled():
+            return
+        entry = dict(attrs, name=name, ms=round(seconds * 1000, 3), at=time.time(),
+                     rerun=self.current_rerun(), thread=threading.current_thread().name)
+        if error:
+            entry["error"] = error
+        with self._lock:
+            self._recent.append(entry)
+            if self.trace_file:
+                with open(self.trace_file, "a") as f:
+                    f.write(json.dumps(entry, default=str) + "\n")
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Times the block. Extra fields can be added to the yielded dict inside the block.
+        """
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attrs
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, error=error, **attrs)
+
+    def recent(self, rerun=None):
+        with self._lock:
+            spans = list(self._recent)
+        return [s for s in spans if rerun is None or s["rerun"] == rerun]
+
+    def summary(self):
+        """
+        Count, total and mean seconds per span name.
+        """
+        with self._lock:
+            rows = [(dict(labels).get("span"), h.count, h.sum) for (metric, labels), h in self._histograms.items()
+                    if metric == "chef_ai_span_seconds"]
+        return [{"span": name, "count": count, "total_s": round(total, 4), "mean_ms": round(total / count * 1000, 3)}
+                for name, count, total in sorted(rows, key=lambda row: -row[2])]
+
+    def register_gauges(self, prefix, read):
+        """
+        Registers a callback returning {name: number}, such as a pool's or cache's stats().
+        It is read on every export as chef_ai_<prefix>_<name> gauges, so the counts stay
+        where they are kept.
+        """
+        with self._lock:
+            self._gauges[prefix] = read
+
+    def gauges(self):
+        """
+        Current value of every registered gauge, as {metric name: number}.
+        """
+        with self._lock:
+            readers = sorted(self._gauges.items())
+        values = {}
+        for prefix, read in readers:
+            for name, value in read().items():
+                if isinstance(value, (int, float)):
+                    values[f"chef_ai_{prefix}_{name}"] = value
+        return values
+
+    def prometheus_text(self):
+        with self._lock:
+            items = sorted(self._histograms.items())
+            snapshot = [(metric, labels, h.buckets, list(h.counts), h.sum, h.count) for (metric, labels), h in items]
+        lines = []
+        declared = set()
+        for metric, labels, buckets, counts, total, count in snapshot:
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} histogram")
+                declared.add(metric)
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+            prefix = label_text + "," if label_text else ""
+            suffix = f"{{{label_text}}}" if label_text else ""
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{suffix} {total}")
+            lines.append(f"{metric}_count{suffix} {count}")
+        for metric, value in self.gauges().items():
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
+span = tracer.span
+
+
+def record_llm_call(kind, model, latency, first_chunk, output_tokens, error=None):
+    """
+    LLM calls stream through generators, so they are recorded once finished,
+    with time to first token and output tokens per second.
+    """
+    attrs = {"kind": kind, "model": model, "ttft_ms": None, "tokens_per_sec": None, "output_tokens": output_tokens}
+    if first_chunk is not None:
+        attrs["ttft_ms"] = round(first_chunk * 1000, 1)
+        tracer.observe("chef_ai_llm_ttft_seconds", first_chunk, model=model)
+    generating = latency - (first_chunk or 0.0)
+    if output_tokens and generating > 0:
+        attrs["tokens_per_sec"] = round(output_tokens / generating, 1)
+        tracer.observe("chef_ai_llm_tokens_per_second", output_tokens / generating, TOKENS_PER_SEC_BUCKETS, model=model)
+    tracer.record(f"llm.{kind}", latency, error=error, **attrs)
+
+
+# --- 3. EXPORT ---
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = tracer.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@st.cache_resource
+def start_metrics_server(port):
+    """
+    Serves /metrics on its own port; Streamlit has no hook for extra routes on its server.
+    """
+    server = ThreadingHTTPServer(("0.0.0.0", int(port)), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
+
+
+# --- 4. DEBUG PANEL ---
+def debug_enabled():
+    return DEBUG or st.query_params.get("debug") == "1"
+
+
+def begin_page(page):
+    """
+    Called first thing in every page script, before its other imports, so that the time
+    to render the page includes loading them.
+    """
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    tracer.begin_rerun(force_sample=debug_enabled(), page=page)
+
+
+def end_page():
+    """
+    Called once the page is drawn, just before the debug panel.
+    """
+    tracer.end_page()
+
+
+def render_debug_panel():
+    """
+    Sidebar panel with the spans of this run and the process-wide totals.
+    """
+    if not debug_enabled():
+        return
+    with st.sidebar.expander("🔍 Debug: timings"):
+        spans = tracer.recent(tracer.current_rerun())
+        st.caption(f"This run: {len(spans)} spans, {sum(s['ms'] for s in spans):.1f} ms traced")
+        st.dataframe(
+            [{key: value for key, value in s.items() if key not in ("at", "rerun", "thread")} for s in spans],
+            use_container_width=True
+        )
+        st.caption("Since server start")
+        st.dataframe(tracer.summary(), use_container_width=True)
+        renders = tracer.page_renders()
+        if renders:
+            st.caption(f"Time to render each page (first visitor: {renders[0]['page']}, {renders[0]['first_ms']:.0f} ms)")
+            st.dataframe(renders, use_container_width=True)
+        gauges = tracer.gauges()
+        if gauges:
+            st.caption("Pools and caches")
+            st.dataframe([{"gauge": name, "value": value} for name, value in gauges.items()], use_container_width=True)
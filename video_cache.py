@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import streamlit as st
+
+from recipe_store import CACHE_DIR
+
+# --- 1. SETTINGS ---
+VIDEO_CACHE_DIR = os.path.join(CACHE_DIR, "videos")
+VIDEO_CACHE_MAX_BYTES = int(os.environ.get("CHEF_AI_VIDEO_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+# Part of every recipe key; bump it when the stored recipe changes shape.
+# v1 was the markdown text, v2 the structured dict from video_extract.
+RECIPE_FORMAT = "recipe-v2"
+
+
+def cache_key(*parts):
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()
+
+
+# --- 2. CACHE ---
+class VideoCache:
+    """
+    Content-addressed file cache for YouTube transcripts and extracted recipes.
+    Entries are JSON files named by the SHA-256 of their key; when the total size goes
+    over the limit, the least recently read files are removed first.
+    """
+    def __init__(self, root=VIDEO_CACHE_DIR, max_bytes=VIDEO_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(root, exist_ok=True)
+        # path -> (size, last used), loaded once so eviction never has to rescan the disk
+        self._entries = {}
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                if name.endswith(".json"):
+                    path = os.path.join(dirpath, name)
+                    stat = os.stat(path)
+                    self._entries[path] = (stat.st_size, stat.st_mtime)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)["value"]
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            self._stats["hits"] += 1
+            if path in self._entries:
+                self._entries[path] = (self._entries[path][0], now)
+        return value
+
+    def _put(self, key, value, **meta):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(dict(meta, value=value, stored_at=time.time()))
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._entries[path] = (len(data.encode()), time.time())
+            self._stats["stores"] += 1
+            self._evict()
+
+    def _evict(self):
+        total = sum(size for size, _ in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for path, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            del self._entries[path]
+            total -= size
+            self._stats["evictions"] += 1
+
+    # --- 3. PUBLIC API ---
+    def get_transcript(self, video_id, languages):
+        return self._get(cache_key("transcript", video_id, ",".join(languages)))
+
+    def put_transcript(self, video_id, languages, transcript):
+        self._put(cache_key("transcript", video_id, ",".join(languages)), transcript,
+                  kind="transcript", video_id=video_id)
+
+    def get_recipe(self, video_id, languages, model):
+        recipe = self._get(cache_key(RECIPE_FORMAT, video_id, ",".join(languages), model))
+        # Anything but a structured recipe is treated as a miss and extracted again
+        return recipe if isinstance(recipe, dict) else None
+
+    def put_recipe(self, video_id, languages, model, recipe):
+        self._put(cache_key(RECIPE_FORMAT, video_id, ",".join(languages), model), recipe,
+                  kind="recipe", video_id=video_id, model=model)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries),
+                        bytes=sum(size for size, _ in self._entries.values()))
+
+
+@st.cache_resource
+def get_video_cache():
+    return VideoCache()
@@ -0,0 +1,137 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ingredients import parse_line
+
+# --- 1. SETTINGS ---
+CHUNK_SECONDS = float(os.environ.get("CHEF_AI_CHUNK_SECONDS", 600))
+CHUNK_CHARS = int(os.environ.get("CHEF_AI_CHUNK_CHARS", 12000))
+EXTRACT_WORKERS = int(os.environ.get("CHEF_AI_EXTRACT_WORKERS", 4))
+
+CHUNK_INSTRUCTION = (
+    "Role: You are an expert Chef. "
+    "Task: Read the following part of a cooking video transcript and extract the recipe "
+    "details that appear in it. The transcript may be in Thai or English; answer in English. "
+    'Output Format: JSON only, as {"title": str, "ingredients": [str], "steps": [str]}. '
+    "Write each ingredient with its quantity, e.g. \"2 tbsp fish sauce\". "
+    "Use an empty string or empty list for anything this part does not mention."
+)
+
+
+# --- 2. SPLITTING ---
+def chunk_transcript(transcript, max_seconds=CHUNK_SECONDS, max_chars=CHUNK_CHARS):
+    """
+    Groups transcript segments into chunks of at most `max_seconds` of video or
+    `max_chars` of text, always cutting between segments.
+    """
+    chunks = []
+    current = []
+    chunk_start = None
+    length = 0
+    for segment in transcript:
+        text = segment.get("text", "").strip()
+        if not text:
+            continue
+        start = float(segment.get("start", 0.0))
+        if current and (start - chunk_start >= max_seconds or length + len(text) > max_chars):
+            chunks.append(" ".join(current))
+            current, length = [], 0
+        if not current:
+            chunk_start = start
+        current.append(text)
+        length += len(text) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+# --- 3. EXTRACTING ---
+def _parse_markdown(text):
+    """
+    Fallback for replies that are not JSON: bullet lines are ingredients, numbered lines are steps.
+    """
+    recipe = {"title": "", "ingredients": [], "steps": []}
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#") and not recipe["title"] and "ingredient" not in line.lower():
+            recipe["title"] = line.lstrip("# ").strip()
+        elif re.match(r"^[-*•]\s+", line):
+            recipe["ingredients"].append(re.sub(r"^[-*•]\s+", "", line))
+        elif re.match(r"^\d+[.)]\s+", line):
+            recipe["steps"].append(re.sub(r"^\d+[.)]\s+", "", line))
+    return recipe
+
+
+def parse_partial(text):
+    cleaned = re.sub(r"^```(?:json)?|```$", "", text.strip(), flags=re.MULTILINE).strip()
+    try:
+        data = json.loads(cleaned)
+    except ValueError:
+        return _parse_markdown(text)
+    if not isinstance(data, dict):
+        return _parse_markdown(text)
+    return {
+        "title": str(data.get("title") or ""),
+        "ingredients": [str(i) for i in data.get("ingredients") or [] if str(i).strip()],
+        "steps": [str(s) for s in data.get("steps") or [] if str(s).strip()],
+    }
+
+
+def extract_partial(llm, chunk, index, total):
+    prompt = f"Transcript part {index + 1} of {total}: {chunk}"
+    return parse_partial(llm.generate([{"role": "user", "content": prompt}], system_instruction=CHUNK_INSTRUCTION))
+
+
+def merge_partials(partials):
+    """
+    Merges partial recipes in video order: the first title wins, ingredients are
+    de-duplicated by canonical name, steps keep their order.
+    """
+    recipe = {"title": "", "ingredients": [], "steps": []}
+    seen_ingredients = set()
+    seen_steps = set()
+    for partial in partials:
+        if partial is None:
+            continue
+        if not recipe["title"] and partial["title"]:
+            recipe["title"] = partial["title"]
+        for item in partial["ingredients"]:
+            key = parse_line(item)[2] or item.lower()
+            if key not in seen_ingredients:
+                seen_ingredients.add(key)
+                recipe["ingredients"].append(item)
+        for step in partial["steps"]:
+            key = " ".join(step.lower().split())
+            if key not in seen_steps:
+                seen_steps.add(key)
+                recipe["steps"].append(step)
+    return recipe
+
+
+def recipe_markdown(recipe):
+    lines = [f"# {recipe['title'] or 'Recipe from the video'}", "", "## Ingredients"]
+    lines += [f"- {item}" for item in recipe["ingredients"]] or ["- (none mentioned yet)"]
+    lines += ["", "## Instructions"]
+    lines += [f"{i}. {step}" for i, step in enumerate(recipe["steps"], start=1)] or ["(none mentioned yet)"]
+    return "\n".join(lines)
+
+
+def extract_recipe(llm, transcript, max_workers=EXTRACT_WORKERS):
+    """
+    Extracts the recipe chunk by chunk on a bounded thread pool.
+    Yields (chunks done, total chunks, merged recipe so far) each time a chunk finishes,
+    so the page can show the recipe filling in instead of waiting for the whole video.
+    """
+    chunks = chunk_transcript(transcript)
+    if not chunks:
+        raise ValueError("The transcript is empty.")
+    partials = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+        futures = {
+            pool.submit(extract_partial, llm, chunk, i, len(chunks)): i for i, chunk in enumerate(chunks)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            partials[futures[future]] = future.result()
+            yield done, len(chunks), merge_partials(partials)
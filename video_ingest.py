@@ -0,0 +1,294 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from rate_limit import TokenBucket
+from recipe_store import CACHE_DIR, CATEGORIES
+from video_extract import extract_recipe
+from video_jobs import fetch_transcript
+
+# --- 1. SETTINGS ---
+INGEST_DB_PATH = os.path.join(CACHE_DIR, "youtube_ingest.sqlite")
+INGEST_WORKERS = int(os.environ.get("CHEF_AI_INGEST_WORKERS", 8))
+# Videos started per second (transcript fetch + extraction), with a small burst allowance
+INGEST_RATE = float(os.environ.get("CHEF_AI_INGEST_RATE", 2.0))
+INGEST_BURST = int(os.environ.get("CHEF_AI_INGEST_BURST", 4))
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS videos (
+        video_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        error TEXT,
+        name TEXT,
+        condiments TEXT,
+        howto TEXT,
+        flags TEXT,
+        updated_at REAL NOT NULL
+    )
+"""
+
+# Keywords used to set the protein flags of an imported recipe
+CATEGORY_KEYWORDS = {
+    "Pork": ("pork", "bacon", "ham"),
+    "Beef": ("beef", "steak"),
+    "Prawn": ("prawn", "shrimp"),
+    "Chicken": ("chicken",),
+    "Fish": ("fish fillet", "sea bass", "salmon", "tuna", "tilapia", "mackerel", "whole fish", "catfish"),
+}
+
+
+# --- 2. PARSING LINKS ---
+def get_video_id(url):
+    query = urlparse(url)
+    if query.hostname == 'youtu.be':
+        return query.path[1:] or None
+    if query.hostname in ('www.youtube.com', 'youtube.com', 'm.youtube.com'):
+        if query.path == '/watch':
+            p = parse_qs(query.query)
+            return p['v'][0] if 'v' in p else None
+        if query.path.startswith('/shorts/'):
+            return query.path.split('/')[2] or None
+    return None
+
+
+def get_playlist_id(url):
+    query = urlparse(url)
+    if query.hostname in ('www.youtube.com', 'youtube.com', 'm.youtube.com') and query.path == '/playlist':
+        return parse_qs(query.query).get('list', [None])[0]
+    return None
+
+
+def expand_playlist(playlist_id):
+    """
+    Lists the video IDs of a playlist. Needs the optional yt-dlp package.
+    """
+    try:
+        import yt_dlp
+    except ImportError:
+        raise RuntimeError("Playlist import needs the yt-dlp package (pip install yt-dlp).")
+    options = {"extract_flat": True, "quiet": True, "skip_download": True}
+    with yt_dlp.YoutubeDL(options) as ydl:
+        info = ydl.extract_info(f"https://www.youtube.com/playlist?list={playlist_id}", download=False)
+    return [entry["id"] for entry in info.get("entries") or [] if entry.get("id")]
+
+
+def parse_video_list(text):
+    """
+    Turns pasted text (links separated by new lines, spaces or commas) into
+    (video IDs in order without duplicates, links that were not understood).
+    """
+    video_ids = []
+    invalid = []
+    for link in re.split(r"[\s,]+", text.strip()):
+        if not link:
+            continue
+        playlist_id = get_playlist_id(link)
+        if playlist_id:
+            video_ids.extend(expand_playlist(playlist_id))
+            continue
+        video_id = get_video_id(link)
+        if video_id:
+            video_ids.append(video_id)
+        else:
+            invalid.append(link)
+    return list(dict.fromkeys(video_ids)), invalid
+
+
+# --- 3. PERSISTENT STORE ---
+_db_lock = threading.Lock()
+# Bumped on every write, so sync_recipes can tell whether the table needs reloading without a query
+_imports = {"generation": 0}
+
+
+def _connect():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    db = sqlite3.connect(INGEST_DB_PATH, timeout=30, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(SCHEMA)
+    return db
+
+
+def guess_categories(recipe):
+    text = " ".join(recipe["ingredients"] + [recipe["title"]]).lower()
+    flags = {cat: int(any(word in text for word in words)) for cat, words in CATEGORY_KEYWORDS.items()}
+    flags["Other"] = int(not any(flags.values()))
+    return flags
+
+
+def recipe_row(recipe):
+    """
+    Maps an extracted recipe onto the columns of the recipes table.
+    """
+    flags = guess_categories(recipe)
+    return (
+        recipe["title"] or "Untitled YouTube recipe",
+        "\n".join(recipe["ingredients"]),
+        "\n".join(f"{i}. {step}" for i, step in enumerate(recipe["steps"], start=1)),
+        ",".join(str(flags.get(cat, 0)) for cat in CATEGORIES),
+    )
+
+
+def save_results(results):
+    """
+    Writes a batch of (video_id, status, error, recipe) results in one transaction.
+    """
+    now = time.time()
+    rows = []
+    for video_id, status, error, recipe in results:
+        name = condiments = howto = flags = None
+        if recipe is not None:
+            name, condiments, howto, flags = recipe_row(recipe)
+        rows.append((video_id, status, error, name, condiments, howto, flags, now))
+    with _db_lock:
+        db = _connect()
+        try:
+            db.execute("BEGIN")
+            db.executemany("INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            db.execute("COMMIT")
+        finally:
+            db.close()
+        _imports["generation"] += 1
+
+
+def done_video_ids(video_ids):
+    with _db_lock:
+        db = _connect()
+        try:
+            done = {row[0] for row in db.execute("SELECT video_id FROM videos WHERE status = 'done'")}
+        finally:
+            db.close()
+    return [v for v in video_ids if v in done]
+
+
+def ingest_generation():
+    return _imports["generation"]
+
+
+def load_ingested_recipes():
+    """
+    Imported recipes as a dataframe shaped like the snapshot, plus a version tag
+    that changes whenever an import lands. Returns (None, "") if nothing was imported.
+    """
+    if not os.path.exists(INGEST_DB_PATH):
+        return None, ""
+    with _db_lock:
+        db = _connect()
+        try:
+            rows = db.execute(
+                "SELECT video_id, name, condiments, howto, flags, updated_at FROM videos "
+                "WHERE status = 'done' ORDER BY updated_at, video_id"
+            ).fetchall()
+        finally:
+            db.close()
+    if not rows:
+        return None, ""
+    records = []
+    for video_id, name, condiments, howto, flags, _ in rows:
+        record = {"name(eng)": name, "condiments": condiments, "howto": howto, "source": f"youtube:{video_id}"}
+        record.update(zip(CATEGORIES, (int(f) for f in flags.split(","))))
+        records.append(record)
+    version = f"yt{len(rows)}-{int(max(row[5] for row in rows))}"
+    return pd.DataFrame(records), version
+
+
+# --- 4. BATCH RUNS ---
+class IngestRun:
+    """
+    One batch import. Videos already imported by an earlier run are skipped,
+    so an interrupted run picks up where it stopped when the same list is submitted again.
+    """
+    def __init__(self, video_ids, llm, video_cache, languages, workers=INGEST_WORKERS,
+                 rate=INGEST_RATE, burst=INGEST_BURST, batch_size=20):
+        self.id = uuid.uuid4().hex
+        self.video_ids = video_ids
+        self.llm = llm
+        self.video_cache = video_cache
+        self.languages = languages
+        self.workers = workers
+        self.batch_size = batch_size
+        self.limiter = TokenBucket(rate, burst)
+        self._lock = threading.Lock()
+        self.progress = {"total": len(video_ids), "skipped": 0, "done": 0, "failed": 0,
+                         "running": True, "errors": [], "started_at": time.time(), "finished_at": None}
+        self._pending = []
+
+    def _process(self, video_id):
+        try:
+            recipe = self.video_cache.get_recipe(video_id, self.languages, self.llm.model)
+            if recipe is None:
+                self.limiter.acquire()
+                transcript = self.video_cache.get_transcript(video_id, self.languages)
+                if transcript is None:
+                    transcript = fetch_transcript(video_id, self.languages)
+                    self.video_cache.put_transcript(video_id, self.languages, transcript)
+                for _, _, recipe in extract_recipe(self.llm, transcript, max_workers=2):
+                    pass
+                self.video_cache.put_recipe(video_id, self.languages, self.llm.model, recipe)
+            result = (video_id, "done", None, recipe)
+        except Exception as e:
+            result = (video_id, "failed", str(e), None)
+        self._record(result)
+
+    def _record(self, result):
+        with self._lock:
+            self._pending.append(result)
+            key = "done" if result[1] == "done" else "failed"
+            self.progress[key] += 1
+            if result[2]:
+                self.progress["errors"] = (self.progress["errors"] + [f"{result[0]}: {result[2]}"])[-20:]
+            flush = len(self._pending) >= self.batch_size
+            batch = self._pending if flush else None
+            if flush:
+                self._pending = []
+        if batch:
+            save_results(batch)
+
+    def run(self):
+        try:
+            already_done = set(done_video_ids(self.video_ids))
+            todo = [v for v in self.video_ids if v not in already_done]
+            with self._lock:
+                self.progress["skipped"] = len(already_done)
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest") as pool:
+                list(pool.map(self._process, todo))
+        finally:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if batch:
+                save_results(batch)
+            with self._lock:
+                self.progress["running"] = False
+                self.progress["finished_at"] = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.progress, errors=list(self.progress["errors"]))
+
+
+_runs = {}
+_runs_lock = threading.Lock()
+
+
+def start_ingest(video_ids, llm, video_cache, languages):
+    """
+    Starts a batch import in a background thread and returns its run ID.
+    """
+    # Imports run in the LLM queue's background lane, behind every chat reply
+    ingest_run = IngestRun(video_ids, llm.background(), video_cache, languages)
+    with _runs_lock:
+        _runs[ingest_run.id] = ingest_run
+    threading.Thread(target=ingest_run.run, daemon=True, name=f"ingest-{ingest_run.id[:8]}").start()
+    return ingest_run.id
+
+
+def get_ingest_progress(run_id):
+    with _runs_lock:
+        ingest_run = _runs.get(run_id)
+    return ingest_run.snapshot() if ingest_run else None
@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from video_extract import extract_recipe
+from tracing import span
+
+# --- 1. SETTINGS ---
+JOB_WORKERS = int(os.environ.get("CHEF_AI_JOB_WORKERS", 4))
+# Finished jobs stay visible this long, so late pollers and duplicate links still find them
+JOB_RETENTION = int(os.environ.get("CHEF_AI_JOB_RETENTION", 600))
+# Set CHEF_AI_TRANSCRIPT_FIXTURE to a JSON transcript file to use it for every video instead of YouTube.
+TRANSCRIPT_FIXTURE = os.environ.get("CHEF_AI_TRANSCRIPT_FIXTURE")
+
+
+def fetch_transcript(video_id, languages):
+    with span("transcript.fetch", video_id=video_id) as attrs:
+        if TRANSCRIPT_FIXTURE:
+            with open(TRANSCRIPT_FIXTURE, encoding="utf-8") as f:
+                transcript = json.load(f)
+        else:
+            from youtube_transcript_api import YouTubeTranscriptApi
+            # The instance API of youtube-transcript-api 1.x; to_raw_data() gives the
+            # same list of {"text", "start", "duration"} dicts the static get_transcript did
+            transcript = YouTubeTranscriptApi().fetch(video_id, languages=languages).to_raw_data()
+        attrs["segments"] = len(transcript)
+        return transcript
+
+
+# --- 2. JOBS ---
+class ExtractionJob:
+    def __init__(self, key, video_id, languages):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.video_id = video_id
+        self.languages = languages
+        self.status = "queued"
+        self.message = "Waiting for a free worker..."
+        self.done_chunks = 0
+        self.total_chunks = 0
+        self.recipe = None
+        self.error = None
+        self.subscribers = 1
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def snapshot(self):
+        """
+        A plain-dict copy that the page can read without racing the worker.
+        """
+        return {
+            "id": self.id, "video_id": self.video_id, "status": self.status, "message": self.message,
+            "done_chunks": self.done_chunks, "total_chunks": self.total_chunks,
+            "recipe": self.recipe, "error": self.error, "subscribers": self.subscribers,
+        }
+
+
+class ExtractionQueue:
+    """
+    Process-wide pool of extraction workers. Requests for a video that is already
+    queued or being extracted join the existing job instead of starting another one.
+    """
+    def __init__(self, llm, video_cache, workers=JOB_WORKERS):
+        self.llm = llm
+        self.video_cache = video_cache
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._by_key = {}
+
+    def submit(self, video_id, languages):
+        key = (video_id, tuple(languages), self.llm.model)
+        with self._lock:
+            self._forget_old_jobs()
+            job = self._by_key.get(key)
+            if job is not None and job.status != "error":
+                job.subscribers += 1
+                return job.id
+            job = ExtractionJob(key, video_id, list(languages))
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+        self._pool.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job else None
+
+    def _update(self, job, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(job, name, value)
+
+    def _run(self, job):
+        try:
+            recipe = self.video_cache.get_recipe(job.video_id, job.languages, self.llm.model)
+            if recipe is None:
+                self._update(job, status="running", message="Fetching the transcript...")
+                transcript = self.video_cache.get_transcript(job.video_id, job.languages)
+                if transcript is None:
+                    transcript = fetch_transcript(job.video_id, job.languages)
+                    self.video_cache.put_transcript(job.video_id, job.languages, transcript)
+
+                self._update(job, message="Watching video and taking notes...")
+                for done, total, recipe in extract_recipe(self.llm, transcript):
+                    self._update(job, done_chunks=done, total_chunks=total, recipe=recipe,
+                                 message=f"Read {done} of {total} parts of the video")
+                self.video_cache.put_recipe(job.video_id, job.languages, self.llm.model, recipe)
+            self._update(job, status="done", recipe=recipe, message="Done", finished_at=time.time())
+        except Exception as e:
+            self._update(job, status="error", error=str(e), finished_at=time.time())
+
+    def _forget_old_jobs(self):
+        cutoff = time.time() - JOB_RETENTION
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at and job.finished_at < cutoff:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ("queued", "running", "done", "error")}
+
+
+@st.cache_resource
+def get_extraction_queue(_llm, _video_cache):
+    return ExtractionQueue(_llm, _video_cache)
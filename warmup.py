@@ -0,0 +1,113 @@
+"""
+Warm start: loads the dataset, builds the indexes and creates the clients in the server
+process before the first visitor arrives, instead of during their first page.
+
+    python warmup.py                        # same as streamlit run main.py, warmed up
+    python warmup.py --server.port 8080     # any other arguments go to streamlit run
+
+The warm-up runs in a background thread while the server starts. A visitor who arrives
+before it finishes waits for the steps still running rather than repeating them.
+Set CHEF_AI_WARMUP=0 to start the server without it.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+from tracing import span
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_SCRIPT = os.path.join(APP_DIR, "main.py")
+WARMUP = os.environ.get("CHEF_AI_WARMUP", "1") != "0"
+# Streamlit warns about every cached call made outside a page run, which is all of them here
+CONTEXT_LOGGER = "streamlit.runtime.scriptrunner_utils.script_run_context"
+
+
+# --- 1. STEPS ---
+def _dataset():
+    import recipe_db
+    return recipe_db.sync_recipes()
+
+
+def _indexes(version):
+    import recipe_db
+    from autocomplete import build_title_index, AUTOCOMPLETE_LIMIT
+    from menu_pages import menu_page
+    from recommend import build_recommender
+    from pantry import build_pantry_index
+    from recipe_search import build_search_index
+    recipe_db.category_counts(version)
+    build_title_index(version)
+    # The first page of the For You table and of the sidebar list
+    menu_page(version, None, "Sheet order", None)
+    menu_page(version, None, "Sheet order", None, AUTOCOMPLETE_LIMIT)
+    build_recommender(version)
+    build_pantry_index(version)
+    build_search_index(version)
+
+
+def _stores():
+    from theme_assets import build_theme_assets
+    from chat_cache import get_answer_cache
+    from session_store import get_session_store
+    from video_cache import get_video_cache
+    build_theme_assets()
+    get_answer_cache()
+    get_session_store()
+    get_video_cache()
+
+
+def _clients():
+    # Importing the Gemini SDK and building the chart library's classes take most of a second
+    import plotly.graph_objects as go
+    from llm_backend import get_llm_backend
+    go.Figure(go.Bar())
+    get_llm_backend()
+
+
+def warm_up():
+    """
+    Runs every step and returns {step: seconds}. A failed step (say, no API key) is
+    reported and skipped, so the rest are still warm.
+    """
+    timings = {}
+    warming = threading.current_thread()
+    logging.getLogger(CONTEXT_LOGGER).addFilter(lambda record: threading.current_thread() is not warming)
+
+    def step(name, run, *args):
+        start = time.perf_counter()
+        try:
+            with span(f"warmup.{name}"):
+                return run(*args)
+        except Exception as e:
+            print(f"Warm-up: {name} failed ({type(e).__name__}: {e})", file=sys.stderr)
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    version = step("dataset", _dataset)
+    if version is not None:
+        step("indexes", _indexes, version)
+    step("stores", _stores)
+    step("clients", _clients)
+    print("Warm-up done in {:.1f}s ({})".format(
+        sum(timings.values()), ", ".join(f"{name} {seconds:.1f}s" for name, seconds in timings.items())))
+    return timings
+
+
+def start_warmup():
+    thread = threading.Thread(target=warm_up, daemon=True, name="warmup")
+    thread.start()
+    return thread
+
+
+# --- 2. SERVER ---
+if __name__ == "__main__":
+    # Runs Streamlit in this process, so the warmed caches are the ones the pages use
+    os.chdir(APP_DIR)
+    sys.path.insert(0, APP_DIR)
+    if WARMUP:
+        start_warmup()
+    from streamlit.web import cli
+    sys.argv = ["streamlit", "run", MAIN_SCRIPT] + sys.argv[1:]
+    sys.exit(cli.main())